@@ -0,0 +1,54 @@
+"""Compare two result files of `scaling.py` and report slowdowns.
+
+    python benchmarks/compare.py baseline.jsonl results.jsonl --threshold 1.2
+
+Records are matched by storage, converter, application and horizon; with several
+records per case (repeated runs) the fastest one counts. The exit code is 1 if
+any metric of a case is slower than `threshold` times its baseline.
+"""
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+
+KEYS = ["storage", "converter", "application", "horizon"]
+METRICS = ["build_time", "build_memory", "solve_time"]
+
+
+def load(path: str) -> pd.DataFrame:
+    with open(path) as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    frame = pd.DataFrame.from_records(records)
+    metrics = [m for m in METRICS if m in frame]
+    return frame.groupby(KEYS)[metrics].min()
+
+
+def compare(baseline: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    "Ratio current / baseline of every metric of the common cases"
+    metrics = [m for m in METRICS if m in baseline and m in current]
+    common = baseline.index.intersection(current.index)
+    return current.loc[common, metrics] / baseline.loc[common, metrics]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    ratio = compare(load(args.baseline), load(args.current))
+    regressions = ratio[(ratio > args.threshold).any(axis=1)]
+
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(ratio.round(2).to_string())
+        if len(regressions):
+            print(f"\n{len(regressions)} case(s) slower than {args.threshold}x the baseline:")
+            print(regressions.round(2).to_string())
+    return 1 if len(regressions) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Build and solve scaling of the storage, converter and application models.
+
+Every combination of the selected storage, converter and application models is
+built and solved for each horizon. One JSON record per run is written to stdout
+or appended to `--output`, e.g.
+
+    python benchmarks/scaling.py --horizons 96 672 --output results.jsonl
+    python benchmarks/scaling.py --storage erm kinetic --application arbitrage --no-solve
+
+Linear cases are solved with `--solver` (HiGHS by default), nonlinear ones
+(exact converter losses, degradation) with `--nlp-solver`. Cases whose solver
+is not installed are recorded with status "skipped".
+"""
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pyomo
+import pyomo.environ as opt
+
+from optses.application.arbitrage import Arbitrage
+from optses.application.peak_shaving import PeakShaving
+from optses.application.self_consumption import SelfConsumptionIncrease
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.storage.converter import (
+    ConstantEfficiencyConverter,
+    IdealConverter,
+    NottonFitConverter,
+    NottonLossConverter,
+    QuadraticLossConverter,
+    RampinelliFitConverter,
+)
+from optses.storage.ecm import RintModel
+from optses.storage.erm import EnergyReservoirKineticModel, EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+
+# 15 min steps: 1 day, 1 week, 1 month, 8760 (the hours of a year, ~3 months), 1 year
+HORIZONS = (96, 672, 2976, 8760, 35040)
+POWER = 50.0  # kW
+SEGMENTS = 16  # pieces of the piecewise linear loss curves
+
+def rint(ocv=([0.0, 0.2, 0.8, 1.0], [3.0, 3.5, 3.9, 4.1]), **kwargs) -> RintModel:
+    "Cell model with a tabulated ocv, scaled to the kW range of the other models"
+    return RintModel(
+        capacity=3.0,
+        ocv=ocv,
+        r0=0.02,
+        circuit={"p": 1, "s": 4},
+        i_bounds=(3.0, 3.0),
+        **kwargs,
+    )
+
+
+# (constructor, nonlinear)
+STORAGE = {
+    "erm": (lambda: EnergyReservoirModel(capacity=100.0, power=POWER, effc=0.95), False),
+    "kinetic": (
+        lambda: EnergyReservoirKineticModel(capacity=100.0, power=POWER, effc=0.95, kinetic_params=(1.2, 1.2)),
+        False,
+    ),
+    # linear ocv and McCormick envelopes keep the model an LP
+    "rint": (lambda: rint(ocv=([0.0, 1.0], [3.2, 4.1]), bilinear="mccormick"), False),
+    "rint-exact": (rint, True),
+    "rint-degradation": (rint, True),
+}
+
+CONVERTER = {
+    "ideal": (lambda: IdealConverter(), False),
+    "constant": (lambda: ConstantEfficiencyConverter(effc=0.96), False),
+    "quadratic": (lambda: QuadraticLossConverter(POWER, k0=0.0072, k1=0.034, k2=0.0225), True),
+    "quadratic-pwl": (
+        lambda: QuadraticLossConverter(POWER, k0=0.0072, k1=0.034, k2=0.0225, segments=SEGMENTS),
+        False,
+    ),
+    "notton": (lambda: NottonLossConverter(POWER, m0=-69.327, k0=0.00696564, k2=0.0332086), True),
+    "notton-pwl": (
+        lambda: NottonLossConverter(POWER, m0=-69.327, k0=0.00696564, k2=0.0332086, segments=SEGMENTS),
+        False,
+    ),
+    "rampinelli": (lambda: RampinelliFitConverter(POWER, k0=0.0094, k1=0.043, k2=0.04), True),
+    "rampinelli-pwl": (
+        lambda: RampinelliFitConverter(POWER, k0=0.0094, k1=0.043, k2=0.04, segments=SEGMENTS),
+        False,
+    ),
+    "notton-fit": (lambda: NottonFitConverter(POWER, k0=0.0072, k2=0.034), True),
+    "notton-fit-pwl": (
+        lambda: NottonFitConverter(POWER, k0=0.0072, k2=0.034, segments=SEGMENTS),
+        False,
+    ),
+}
+
+APPLICATION = {
+    "peak_shaving": lambda: PeakShaving(peak_power_price=100.0, electricity_price=0.3),
+    "arbitrage": lambda: Arbitrage(),
+    "self_consumption": lambda: SelfConsumptionIncrease(electricity_price=0.3, feedin_tariff=0.08),
+}
+
+
+def profiles(horizon: int, dt: float = 0.25, seed: int = 0) -> tuple:
+    "Synthetic net load (with PV feed-in) and price profiles"
+    rng = np.random.default_rng(seed)
+    hour = np.arange(horizon) * dt % 24
+    load = 30 + 15 * np.sin(2 * np.pi * (hour - 8) / 24) + rng.normal(0, 5, horizon)
+    pv = 40 * np.clip(np.sin(np.pi * (hour - 6) / 12), 0, None)
+    price = 0.2 + 0.1 * np.sin(2 * np.pi * (hour - 12) / 24) + rng.normal(0, 0.02, horizon)
+    return load - pv, price
+
+
+def system(storage: str, converter: str, application: str, horizon: int) -> SystemModel:
+    load, price = profiles(horizon)
+    return SystemModel(
+        storage=StorageSystem(STORAGE[storage][0](), CONVERTER[converter][0]()),
+        application=APPLICATION[application](),
+        load=Load(load),
+        price=price if application == "arbitrage" else None,
+    )
+
+
+def build(system_model: SystemModel, storage: str) -> opt.ConcreteModel:
+    model = system_model.build()
+    if storage == "rint-degradation":
+        system_model.storage.cell_model.degradation_model(model.storage)
+        model.objective.expr = model.objective.expr + model.storage.degradation_cost
+    return model
+
+
+def size(model) -> dict:
+    return {
+        "variables": sum(len(v) for v in model.component_objects(opt.Var, active=True)),
+        "constraints": sum(len(c) for c in model.component_objects(opt.Constraint, active=True)),
+    }
+
+
+def run_case(storage, converter, application, horizon, solver, nlp_solver, solve=True, memory=True) -> dict:
+    record = {
+        "storage": storage,
+        "converter": converter,
+        "application": application,
+        "horizon": horizon,
+    }
+    nonlinear = STORAGE[storage][1] or CONVERTER[converter][1]
+    record["problem"] = "nlp" if nonlinear else "lp"
+    system_model = system(storage, converter, application, horizon)
+
+    try:
+        start = time.perf_counter()
+        model = build(system_model, storage)
+        record["build_time"] = time.perf_counter() - start
+        record.update(size(model))
+
+        if memory:
+            # separate build, tracing slows down the build itself
+            tracemalloc.start()
+            build(system_model, storage)
+            record["build_memory"] = tracemalloc.get_traced_memory()[1] / 2**20  # MiB
+            tracemalloc.stop()
+    except Exception as error:
+        record.update(status="error", error=repr(error))
+        return record
+
+    if not solve:
+        record["status"] = "built"
+        return record
+
+    name = nlp_solver if nonlinear else solver
+    record["solver"] = name
+    backend = solver_factory(name)
+    if not backend.available():
+        record["status"] = "skipped"
+        return record
+
+    try:
+        start = time.perf_counter()
+        results = backend.solve(model)
+        record["solve_time"] = time.perf_counter() - start
+        record["status"] = str(results.solver.termination_condition)
+        if opt.check_optimal_termination(results):
+            record["objective"] = opt.value(model.objective)
+    except Exception as error:
+        record.update(status="error", error=repr(error))
+    return record
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storage", nargs="+", choices=STORAGE, default=list(STORAGE))
+    parser.add_argument("--converter", nargs="+", choices=CONVERTER, default=list(CONVERTER))
+    parser.add_argument("--application", nargs="+", choices=APPLICATION, default=list(APPLICATION))
+    parser.add_argument("--horizons", nargs="+", type=int, default=list(HORIZONS))
+    parser.add_argument("--solver", default="highs")
+    parser.add_argument("--nlp-solver", default="ipopt")
+    parser.add_argument("--no-solve", action="store_true", help="only measure the model build")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced build")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case")
+    parser.add_argument("--output", help="JSON lines file the records are appended to")
+    args = parser.parse_args(argv)
+
+    environment = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pyomo": pyomo.version.version,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for storage, converter, application, horizon, _ in itertools.product(
+            args.storage, args.converter, args.application, args.horizons, range(args.repeat)
+        ):
+            record = run_case(
+                storage,
+                converter,
+                application,
+                horizon,
+                args.solver,
+                args.nlp_solver,
+                solve=not args.no_solve,
+                memory=not args.no_memory,
+            )
+            record.update(environment)
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyomo.environ as opt
+
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.storage.fleet import StorageFleet
+from optses.timeseries import add_time_series, step_lengths, update_param
+
+
+def _unit_model(storage, horizon: int, dt, weight) -> opt.ConcreteModel:
+    "Storage unit with the proximal ADMM objective `cost + rho/2 * ||power - target||^2`"
+    model = opt.ConcreteModel()
+    model.time = opt.RangeSet(0, horizon - 1)
+    if np.ndim(dt) == 0:
+        model.dt = opt.Param(within=opt.PositiveReals, initialize=dt)
+    else:
+        add_time_series(model, "dt", dt, within=opt.PositiveReals)
+    if weight is not None:
+        add_time_series(model, "weight", weight, within=opt.NonNegativeReals)
+
+    model.storage = opt.Block()
+    storage.build(model.storage)
+
+    _add_proximal_objective(model, getattr(model.storage, "cost", 0.0))
+    return model
+
+
+def _add_proximal_objective(model, cost) -> None:
+    "Objective `cost + rho/2 * ||storage.power - target||^2` with mutable `rho` and `target`"
+    model.rho = opt.Param(within=opt.PositiveReals, initialize=1.0, mutable=True)
+    add_time_series(model, "target", 0.0)
+
+    # scaled by 1 / rho with a diagonal unit hessian, HiGHS misreports small
+    # hessians of (pec - ped)^2 as unbounded
+    model.deviation = opt.Var(model.time, within=opt.Reals)
+
+    @model.Constraint(model.time)
+    def deviation_constraint(m, t):
+        return m.deviation[t] == m.storage.power[t] - m.target[t]
+
+    model.admm_objective = opt.Objective(
+        expr=cost / model.rho + sum(model.deviation[t] ** 2 for t in model.time) / 2,
+        sense=opt.minimize,
+    )
+
+
+class _TotalPower:
+    "Storage placeholder of the coordinator: the free total power of all units"
+
+    def build(self, block) -> None:
+        model = block.model()
+        block.power = opt.Var(model.time, within=opt.Reals)
+
+
+# state of a worker process, unit models are built on first use
+_worker = {}
+
+
+def _init_worker(units, horizon, dt, weight, solver, options) -> None:
+    _worker["units"] = units
+    _worker["args"] = (horizon, dt, weight)
+    _worker["solver"] = (solver, options)
+    _worker["models"] = {}
+
+
+def _solve_unit(task) -> dict:
+    i, target, rho = task
+    models = _worker["models"]
+    if i not in models:
+        solver, options = _worker["solver"]
+        models[i] = (_unit_model(_worker["units"][i], *_worker["args"]), solver_factory(solver, options, quadratic=True))
+    model, solver = models[i]
+
+    update_param(model.target, target)
+    model.rho = rho
+    start = time.perf_counter()
+    results = solver.solve(model)
+    elapsed = time.perf_counter() - start
+    if not opt.check_optimal_termination(results):
+        raise RuntimeError(f"Solve of unit {i} failed: {results.solver.termination_condition}")
+
+    return {
+        "unit": i,
+        "power": np.array([opt.value(model.storage.power[t]) for t in model.time]),
+        "cost": opt.value(getattr(model.storage, "cost", 0.0)),
+        "time": elapsed,
+    }
+
+
+class SharingADMM:
+    """Storage units coupled only through the grid connection, solved unit by unit.
+
+    Sharing ADMM (Boyd et al., Distributed Optimization and Statistical Learning via
+    ADMM, sec. 7.3): every iteration solves the `StorageSystem` subproblem of each
+    unit in parallel worker processes, with its own cost plus a quadratic proximal
+    term, and then the coordinator problem of load, grid and application for the
+    total storage power. The scaled dual `u` prices the mismatch between the sum
+    of the unit powers and the total power of the coordinator.
+
+    The units are the `units` given or those of a `StorageFleet` storage of the
+    system. Subproblems have quadratic objectives, `solver` (created by
+    `solver_factory` with `options`) has to support them (e.g. `highs` via Pyomo's
+    HiGHS interface, `gurobi`, `ipopt`). With `adaptive` the penalty `rho` is
+    balanced between the primal and dual residuals.
+
+    Iterations stop when both residuals are below their tolerances
+    `sqrt(n) * tol_abs + tol_rel * scale`. Every iteration is recorded in
+    `telemetry` (residuals, rho, objective and solve times).
+    """
+
+    def __init__(
+        self,
+        system: SystemModel,
+        units: list = None,
+        solver: str = "highs",
+        options: dict = None,
+        processes: int = None,
+        rho: float = 1.0,
+        max_iterations: int = 200,
+        tol_abs: float = 1e-4,
+        tol_rel: float = 1e-3,
+        adaptive: bool = True,
+        callback=None,  # called with the telemetry record of every iteration
+    ) -> None:
+        if max_iterations < 1:
+            raise ValueError("max_iterations must be at least 1")
+        if units is None:
+            if not isinstance(system.storage, StorageFleet):
+                raise TypeError("units are required if the storage is not a StorageFleet")
+            units = system.storage.units()
+
+        self.system = system
+        self.units = list(units)
+        self.solver = solver
+        self.options = options
+        self.processes = processes
+        self.rho = rho
+        self.max_iterations = max_iterations
+        self.tol_abs = tol_abs
+        self.tol_rel = tol_rel
+        self.adaptive = adaptive
+        self.callback = callback
+        self.telemetry = []
+
+    def _coordinator(self, horizon: int) -> opt.ConcreteModel:
+        system = self.system
+        model = SystemModel(
+            storage=_TotalPower(),
+            application=system.application,
+            load=system.load,
+            grid=system.grid,
+            dt=system.dt,
+            weight=system.weight,
+        ).build(horizon)
+
+        # g(S) + rho / (2 N) ||S - N (u + x_mean)||^2 for the total storage power S
+        model.application_cost = opt.Expression(expr=model.objective.expr)
+        model.objective.deactivate()
+        _add_proximal_objective(model, model.application_cost)
+        return model
+
+    def _solve(self, solver, model) -> float:
+        start = time.perf_counter()
+        results = solver.solve(model)
+        if not opt.check_optimal_termination(results):
+            raise RuntimeError(f"Coordinator solve failed: {results.solver.termination_condition}")
+        return time.perf_counter() - start
+
+    def run(self, horizon: int = None, monolithic: bool = False) -> dict:
+        system = self.system
+        if horizon is None:
+            horizon = len(system.load.profile)
+        dt = step_lengths(system.dt, horizon, broadcast=False)
+        weight = None if system.weight is None else system.weight[:horizon]
+
+        N = len(self.units)
+        rho = self.rho
+        x = np.zeros((N, horizon))  # unit powers
+        z_mean = np.zeros(horizon)  # total power of the coordinator / N
+        u = np.zeros(horizon)  # scaled dual of the coupling
+        x_mean = x.mean(axis=0)
+
+        coordinator = self._coordinator(horizon)
+        solver = solver_factory(self.solver, self.options, quadratic=True)
+        self.telemetry = []
+        processes = self.processes or os.cpu_count()
+        chunksize = max(1, N // (4 * processes))
+
+        start_time = time.perf_counter()
+        with multiprocessing.Pool(
+            processes=processes,
+            initializer=_init_worker,
+            initargs=(self.units, horizon, dt, weight, self.solver, self.options),
+        ) as pool:
+            for k in range(self.max_iterations):
+                iteration_start = time.perf_counter()
+
+                # unit updates, in parallel
+                z_local = x - x_mean + z_mean  # local copies z_i of the total power
+                tasks = [(i, x[i] - x_mean + z_mean - u, rho) for i in range(N)]
+                results = sorted(pool.imap_unordered(_solve_unit, tasks, chunksize=chunksize), key=lambda r: r["unit"])
+                x = np.array([r["power"] for r in results])
+                unit_cost = sum(r["cost"] for r in results)
+                unit_times = [r["time"] for r in results]
+                x_mean = x.mean(axis=0)
+
+                # coordinator update
+                coordinator.rho = rho / N
+                update_param(coordinator.target, N * (u + x_mean))
+                coordinator_time = self._solve(solver, coordinator)
+                z_mean = np.array([opt.value(coordinator.storage.power[t]) for t in coordinator.time]) / N
+
+                # dual update
+                u = u + x_mean - z_mean
+
+                # residuals of the coupling x_i = z_i
+                primal = np.sqrt(N) * np.linalg.norm(x_mean - z_mean)
+                dual = rho * np.linalg.norm(x - x_mean + z_mean - z_local)
+                n = np.sqrt(N * horizon)
+                tol_primal = n * self.tol_abs + self.tol_rel * max(np.linalg.norm(x), np.sqrt(N) * np.linalg.norm(z_mean))
+                tol_dual = n * self.tol_abs + self.tol_rel * rho * np.sqrt(N) * np.linalg.norm(u)
+
+                record = {
+                    "iteration": k,
+                    "primal_residual": primal,
+                    "dual_residual": dual,
+                    "tol_primal": tol_primal,
+                    "tol_dual": tol_dual,
+                    "rho": rho,
+                    "objective": unit_cost + opt.value(coordinator.application_cost),
+                    "unit_time_max": max(unit_times),
+                    "unit_time_sum": sum(unit_times),
+                    "coordinator_time": coordinator_time,
+                    "time": time.perf_counter() - iteration_start,
+                }
+                self.telemetry.append(record)
+                if self.callback is not None:
+                    self.callback(record)
+
+                if primal <= tol_primal and dual <= tol_dual:
+                    break
+
+                if self.adaptive:
+                    # residual balancing, the scaled dual changes with rho
+                    if primal > 10 * dual:
+                        rho, u = 2 * rho, u / 2
+                    elif dual > 10 * primal:
+                        rho, u = rho / 2, u * 2
+        elapsed = time.perf_counter() - start_time
+
+        # objective of the unit schedules: the coordinator at the summed unit power
+        total = x.sum(axis=0)
+        for t in coordinator.time:
+            coordinator.storage.power[t].fix(total[t])
+        self._solve(solver, coordinator)
+        objective = unit_cost + opt.value(coordinator.application_cost)
+
+        result = {
+            "objective": objective,
+            "iterations": len(self.telemetry),
+            "converged": primal <= tol_primal and dual <= tol_dual,
+            "time": elapsed,
+            "power": x,
+            "grid": np.array([opt.value(coordinator.grid[t] - coordinator.feedin[t]) for t in coordinator.time]),
+            "telemetry": pd.DataFrame.from_records(self.telemetry, index="iteration"),
+        }
+
+        if monolithic:
+            start_time = time.perf_counter()
+            model = system.build(horizon)
+            results = solver_factory(self.solver, self.options).solve(model)
+            if not opt.check_optimal_termination(results):
+                raise RuntimeError("Monolithic solve failed")
+            reference = opt.value(model.objective)
+
+            result["monolithic_objective"] = reference
+            result["monolithic_time"] = time.perf_counter() - start_time
+            result["gap"] = (objective - reference) / max(abs(reference), 1e-9)
+
+        return result
@@ -0,0 +1,239 @@
+import time
+
+import numpy as np
+import pyomo.environ as opt
+
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.storage.erm import EnergyReservoirDimensionModel, EnergyReservoirModel
+from optses.timeseries import step_length
+
+
+def kmeans_medoids(data: np.ndarray, n_clusters: int, seed: int = 0, max_iter: int = 100) -> tuple:
+    """k-means clustering of the rows of `data`, each cluster represented by the
+    member closest to its mean (not a k-medoids/PAM optimum)"""
+    rng = np.random.default_rng(seed)
+
+    # k-means++ initialization
+    centers = [data[rng.integers(len(data))]]
+    for _ in range(1, n_clusters):
+        distance = np.min([((data - c) ** 2).sum(axis=1) for c in centers], axis=0)
+        if distance.sum() == 0:
+            centers.append(data[rng.integers(len(data))])
+        else:
+            centers.append(data[rng.choice(len(data), p=distance / distance.sum())])
+    centers = np.array(centers)
+
+    for _ in range(max_iter):
+        distance = ((data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distance.argmin(axis=1)
+        new_centers = np.array(
+            [data[labels == k].mean(axis=0) if np.any(labels == k) else centers[k] for k in range(n_clusters)]
+        )
+        if np.allclose(new_centers, centers):
+            break
+        centers = new_centers
+
+    # the medoid keeps real extremes of the profiles
+    distance = ((data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    labels = distance.argmin(axis=1)
+    medoids = np.array(
+        [np.flatnonzero(labels == k)[distance[labels == k, k].argmin()] for k in range(n_clusters) if np.any(labels == k)]
+    )
+    # relabel to the non-empty clusters
+    labels = ((data[:, None, :] - data[medoids][None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    return medoids, labels
+
+
+class RepresentativePeriods:
+    """Time series aggregation into weighted representative periods.
+
+    The load (and tariff) profiles are cut into periods of `period_length` steps and
+    clustered into `n_periods` representative periods (k-means, each cluster
+    represented by the period closest to its mean). With `keep_peak` the period
+    holding the load maximum is always kept. The model is built on the
+    concatenated representative periods only, every step weighted by the number
+    of periods it stands for.
+
+    The storage soc is linked across the original sequence of periods: the soc
+    within a representative period is relative to its start, and an inter-period
+    soc per original period carries the state from period to period, with bounds
+    enforced via the intra-period soc extremes.
+    """
+
+    def __init__(
+        self,
+        period_length: int,
+        n_periods: int,
+        keep_peak: bool = True,
+        seed: int = 0,
+    ) -> None:
+        if n_periods <= int(keep_peak):
+            raise ValueError("n_periods must exceed the kept peak period")
+        self.period_length = period_length
+        self.n_periods = n_periods
+        self.keep_peak = keep_peak
+        self.seed = seed
+
+    def fit(self, system: SystemModel) -> "RepresentativePeriods":
+        L = self.period_length
+        n = len(system.load.profile) // L
+        profiles = [system.load.profile[: n * L].reshape(n, L)]
+        for values in system.application.series().values():
+            profiles.append(values[: n * L].reshape(n, L))
+
+        # each profile is normalized to the same scale
+        features = np.hstack([p / max(np.abs(p).max(), 1e-12) for p in profiles])
+
+        n_clusters = self.n_periods
+        peak = int(profiles[0].max(axis=1).argmax())
+        if self.keep_peak:
+            n_clusters -= 1
+            candidates = np.delete(np.arange(n), peak)
+        else:
+            candidates = np.arange(n)
+        if n_clusters > len(candidates):
+            raise ValueError(f"{self.n_periods} representative periods requested, the profile has {n} periods")
+
+        medoids, labels = kmeans_medoids(features[candidates], n_clusters, seed=self.seed)
+        medoids = candidates[medoids]
+        order = np.empty(n, dtype=int)
+        order[candidates] = labels
+        if self.keep_peak:
+            medoids = np.append(medoids, peak)
+            order[peak] = len(medoids) - 1
+
+        self.medoids = medoids  # original period of each representative
+        self.order = order  # representative of each original period
+        self.weights = np.bincount(order, minlength=len(medoids)).astype(float)
+        return self
+
+    def aggregate(self, profile) -> np.ndarray:
+        "Concatenated representative periods of a profile"
+        L = self.period_length
+        return np.concatenate([profile[m * L : (m + 1) * L] for m in self.medoids])
+
+    def reduced_system(self, system: SystemModel) -> SystemModel:
+        return SystemModel(
+            storage=system.storage,
+            application=system.application.with_tariffs(
+                **{name: self.aggregate(values) for name, values in system.application.series().items()}
+            ),
+            load=Load(self.aggregate(system.load.profile)),
+            grid=system.grid,
+            dt=system.dt,
+            weight=np.repeat(self.weights, self.period_length),
+        )
+
+    def build(self, system: SystemModel) -> opt.ConcreteModel:
+        "Fit the periods and build the reduced model with inter-period soc linking"
+        # the soc is relative to the period start, constraints on the absolute soc
+        # (e.g. the kinetic power limits) would be wrong
+        cell = system.storage.cell_model
+        if type(cell) not in (EnergyReservoirModel, EnergyReservoirDimensionModel):
+            raise TypeError(f"Unsupported storage model for representative periods: {type(cell).__name__}")
+        if np.ndim(system.dt) != 0:
+            raise ValueError("Representative periods require a uniform time grid")
+
+        self.fit(system)
+        model = self.reduced_system(system).build()
+        self.link_periods(model)
+        return model
+
+    def link_periods(self, model) -> None:
+        storage = model.storage
+        L = self.period_length
+        n_rep = len(self.medoids)
+        starts = [k * L for k in range(n_rep)]
+
+        # soc is relative to the start of its representative period
+        for t in model.time:
+            storage.soc[t].domain = opt.Reals
+            storage.soc[t].setlb(None)
+            storage.soc[t].setub(None)
+        for name in ("soc_lower_bound_constraint", "soc_upper_bound_constraint"):
+            if hasattr(storage, name):
+                storage.component(name).deactivate()
+        storage.soc_end_constraint.deactivate()
+        for t in starts:
+            storage.soc_balance_constraint[t].deactivate()
+
+        block = model.period_linking = opt.Block()
+        block.representatives = opt.RangeSet(0, n_rep - 1)
+        block.periods = opt.RangeSet(0, len(self.order))
+
+        @block.Constraint(block.representatives)
+        def soc_intra_start(b, k):
+            t = starts[k]
+            return storage.soc[t] == step_length(model, t) * (
+                storage.pc[t] * storage.effc - storage.pd[t] * (1 / storage.effd) - storage.psd
+            )
+
+        block.soc_intra_max = opt.Var(block.representatives, within=opt.NonNegativeReals)
+        block.soc_intra_min = opt.Var(block.representatives, within=opt.NonPositiveReals)
+
+        @block.Constraint(model.time)
+        def soc_intra_max_constraint(b, t):
+            return storage.soc[t] <= b.soc_intra_max[t // L]
+
+        @block.Constraint(model.time)
+        def soc_intra_min_constraint(b, t):
+            return storage.soc[t] >= b.soc_intra_min[t // L]
+
+        # absolute soc at the start of every original period
+        block.soc_inter = opt.Var(block.periods)
+
+        @block.Constraint()
+        def soc_inter_start(b):
+            return b.soc_inter[0] == storage.soc_start * storage.capacity
+
+        @block.Constraint(block.periods)
+        def soc_inter_balance(b, d):
+            if d == b.periods.last():
+                return opt.Constraint.Skip
+            k = int(self.order[d])
+            return b.soc_inter[d + 1] == b.soc_inter[d] + storage.soc[starts[k] + L - 1]
+
+        @block.Constraint()
+        def soc_inter_end(b):
+            return b.soc_inter[b.periods.last()] >= storage.soc_end * storage.capacity
+
+        @block.Constraint(block.periods)
+        def soc_upper(b, d):
+            if d == b.periods.last():
+                return b.soc_inter[d] <= storage.soc_max * storage.capacity
+            return b.soc_inter[d] + b.soc_intra_max[int(self.order[d])] <= storage.soc_max * storage.capacity
+
+        @block.Constraint(block.periods)
+        def soc_lower(b, d):
+            if d == b.periods.last():
+                return b.soc_inter[d] >= storage.soc_min * storage.capacity
+            return b.soc_inter[d] + b.soc_intra_min[int(self.order[d])] >= storage.soc_min * storage.capacity
+
+    def compare(self, system: SystemModel, solver="highs") -> dict:
+        "Sizing of the aggregated and the full-resolution model and their relative errors"
+        n = len(system.load.profile) // self.period_length * self.period_length
+
+        results = {}
+        for name, build in (
+            ("aggregated", lambda: self.build(system)),
+            ("full", lambda: system.build(n)),
+        ):
+            start = time.perf_counter()
+            model = build()
+            status = solver_factory(solver).solve(model)
+            if not opt.check_optimal_termination(status):
+                raise RuntimeError(f"Solve of the {name} model failed")
+            results[name] = {
+                "capacity": opt.value(model.storage.capacity),
+                "max_power": opt.value(model.storage.max_power),
+                "objective": opt.value(model.objective),
+                "time": time.perf_counter() - start,
+            }
+
+        for key in ("capacity", "max_power", "objective"):
+            full = results["full"][key]
+            error = results["aggregated"][key] - full
+            results[f"{key}_error"] = error / abs(full) if full != 0 else error
+        return results
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import pathlib
+import shutil
+import tempfile
+
+import numpy as np
+import pyomo.environ as opt
+from pyomo.opt import ReaderFactory, ResultsFormat
+
+from optses.model import SystemModel
+from optses.results import extract
+
+
+class AsyncSolver:
+    """Solves models with AMPL-interfaced solvers (ipopt, cbc, bonmin, ...) without
+    blocking the event loop.
+
+    Models are built, written (NL file) and their solutions loaded in the loop's
+    default executor; the solver itself runs as asyncio subprocess. At most
+    `max_processes` solver processes run at the same time, further solves wait
+    for a free slot. A solve that exceeds its `timeout` (s) or whose task is
+    cancelled kills its solver process.
+
+        solver = AsyncSolver("ipopt", max_processes=8)
+        results = await asyncio.gather(*(solver.run(system) for system in systems))
+    """
+
+    def __init__(
+        self,
+        solver: str = "ipopt",
+        max_processes: int = None,
+        options: dict = None,
+        executable: str = None,
+        timeout: float = None,
+    ) -> None:
+        self.name = solver
+        self.executable = executable or shutil.which(solver)
+        self.options = dict(options or {})
+        self.timeout = timeout
+        self.max_processes = max_processes or os.cpu_count()
+        self._semaphore = None
+        self._loop = None
+
+    def available(self) -> bool:
+        return self.executable is not None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # bound to the running loop, recreated for a new loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_processes)
+            self._loop = loop
+        return self._semaphore
+
+    async def solve(self, model: opt.ConcreteModel, timeout: float = None):
+        "Solve the model and load the solution, returns the pyomo results"
+        if not self.available():
+            raise RuntimeError(f"Solver executable {self.name} not found")
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+
+        with tempfile.TemporaryDirectory(prefix="optses-") as directory:
+            stub = pathlib.Path(directory) / "model"
+            _, smap_id = await loop.run_in_executor(
+                None,
+                lambda: model.write(
+                    f"{stub}.nl", format="nl", io_options={"symbolic_solver_labels": False}
+                ),
+            )
+            try:
+                async with self.semaphore:
+                    returncode, log = await self._run(stub, timeout)
+                if returncode != 0 and not stub.with_suffix(".sol").exists():
+                    raise RuntimeError(f"{self.name} exited with code {returncode}:\n{log}")
+                results = await loop.run_in_executor(None, self._load, model, stub, smap_id)
+            finally:
+                # loading the solution already drops the symbol map
+                model.solutions.symbol_map.pop(smap_id, None)
+
+        results.solver.name = self.name
+        return results
+
+    async def _run(self, stub: pathlib.Path, timeout: float) -> tuple:
+        env = os.environ.copy()
+        env[f"{self.name}_options"] = " ".join(f"{k}={v}" for k, v in self.options.items())
+
+        process = await asyncio.create_subprocess_exec(
+            self.executable,
+            f"{stub}.nl",
+            "-AMPL",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=stub.parent,
+            env=env,
+        )
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except BaseException:
+            # timeout or cancellation, the solver must not outlive its request
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        return process.returncode, output.decode(errors="replace")
+
+    @staticmethod
+    def _load(model, stub: pathlib.Path, smap_id):
+        suffixes = [
+            suffix.local_name
+            for suffix in model.component_objects(opt.Suffix, descend_into=False)
+            if suffix.import_enabled()
+        ]
+        reader = ReaderFactory(ResultsFormat.sol)
+        results = reader(f"{stub}.sol", suffixes=suffixes)
+        results._smap_id = smap_id
+        if len(results.solution) > 0:
+            model.solutions.load_from(results)
+        return results
+
+    async def run(
+        self,
+        system: SystemModel,
+        horizon: int = None,
+        components=None,
+        timeout: float = None,
+    ) -> dict:
+        "Build and solve the system, returns the extracted results and the objective"
+        loop = asyncio.get_running_loop()
+        model = await loop.run_in_executor(None, system.build, horizon)
+
+        results = await self.solve(model, timeout=timeout)
+        if not opt.check_optimal_termination(results):
+            raise RuntimeError(
+                f"Solver did not find an optimal solution: {results.solver.termination_condition}"
+            )
+
+        result = await loop.run_in_executor(None, extract, model, components)
+        result["objective"] = np.array(opt.value(model.objective))
+        return result
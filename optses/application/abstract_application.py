@@ -1,8 +1,47 @@
+import copy
 from abc import ABC, abstractmethod
 
+import numpy as np
 from pyomo.environ import Model
 
+from optses.timeseries import as_array, update_param
+
 class AbstractApplication(ABC):
+    # tariffs given as scalar or time series, stored as `_<name>` and built as
+    # mutable params `block.<name>` indexed by the model time
+    tariffs = ()
+
     @abstractmethod
     def build(self, model: Model) -> None:
         pass
+
+    def series(self) -> dict:
+        "Tariffs given as time series"
+        values = {name: getattr(self, f"_{name}") for name in self.tariffs}
+        return {name: v for name, v in values.items() if np.ndim(v) > 0}
+
+    def with_tariffs(self, **tariffs) -> "AbstractApplication":
+        "Copy of the application with other tariff values"
+        self._check_tariffs(tariffs)
+        application = copy.copy(self)
+        for name, values in tariffs.items():
+            setattr(application, f"_{name}", tariff(values))
+        return application
+
+    def update(self, block, **tariffs) -> None:
+        "Set the tariffs of the built application block in place"
+        self._check_tariffs(tariffs)
+        for name, values in tariffs.items():
+            update_param(block.component(name), values)
+
+    def _check_tariffs(self, tariffs: dict) -> None:
+        unknown = set(tariffs) - set(self.tariffs)
+        if unknown:
+            raise ValueError(f"{type(self).__name__} has no tariffs {sorted(unknown)}")
+
+
+def tariff(values):
+    "Scalar tariff as float, time-varying tariff as array"
+    if np.ndim(values) == 0 and not isinstance(values, str):
+        return float(values)
+    return as_array(values)
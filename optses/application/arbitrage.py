@@ -1,14 +1,21 @@
-from optses.application.abstract_application import AbstractApplication
+from optses.application.abstract_application import AbstractApplication, tariff
+from optses.timeseries import add_time_series, step_length, time_weight
 
 import pyomo.environ as opt
 
 class Arbitrage(AbstractApplication):
-    def __init__(self) -> None:
+    tariffs = ("price",)
+
+    def __init__(self, price=None) -> None:
+        self._price = None if price is None else tariff(price)  # scalar or time series
         self.name = "arbitrage"
 
     def build(self, block: opt.Model) -> None:
         model = block.model()
+        if self._price is None:
+            raise ValueError("Arbitrage requires a price")
+        add_time_series(block, "price", self._price)
 
         @block.Expression()
         def cost(b):
-            return sum((model.grid[t] - model.feedin[t]) * model.price[t] * model.dt for t in model.time)
+            return sum((model.grid[t] - model.feedin[t]) * b.price[t] * step_length(model, t) * time_weight(model, t) for t in model.time)
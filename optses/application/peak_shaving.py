@@ -2,19 +2,22 @@ import numpy as np
 import pandas as pd
 import pyomo.environ as opt
 
-from optses.application.abstract_application import AbstractApplication
+from optses.application.abstract_application import AbstractApplication, tariff
+from optses.timeseries import add_time_series, step_length, time_weight
 
 class PeakShaving(AbstractApplication):
+    tariffs = ("electricity_price",)
+
     def __init__(self, peak_power_price:float, electricity_price=0.0, peak_power_min=0.0) -> None:
         self._peak_power_price = peak_power_price
-        self._electricity_price = electricity_price
+        self._electricity_price = tariff(electricity_price) # scalar or time series
         self._peak_power_min = peak_power_min
 
         self.name = "peak_shaving" # TODO: name as input
 
     def build(self, block: opt.Model) -> None:
         model = block.model()
-        block.electricity_price = opt.Param(within=opt.NonNegativeReals, mutable=True, initialize=self._electricity_price)
+        add_time_series(block, "electricity_price", self._electricity_price, within=opt.NonNegativeReals)
         block.peak_power_price  = opt.Param(within=opt.NonNegativeReals, mutable=True, initialize=self._peak_power_price)
         block.peak_power_min    = opt.Param(within=opt.NonNegativeReals, mutable=True, initialize=self._peak_power_min)
 
@@ -27,4 +30,4 @@ class PeakShaving(AbstractApplication):
         # TODO: check and differentiate if peak_power_price == 0? Probably not, else also handle price param
         @block.Expression()
         def cost(b):
-            return b.peak * b.peak_power_price + sum(model.grid[t] * b.electricity_price for t in model.time) * model.dt
+            return b.peak * b.peak_power_price + sum(model.grid[t] * b.electricity_price[t] * step_length(model, t) * time_weight(model, t) for t in model.time)
@@ -1,17 +1,20 @@
-from optses.application.abstract_application import AbstractApplication
+from optses.application.abstract_application import AbstractApplication, tariff
+from optses.timeseries import add_time_series, step_length, time_weight
 
 import numpy as np
 import pandas as pd
 import pyomo.environ as opt
 
 class SelfConsumptionIncrease(AbstractApplication):
+    tariffs = ("electricity_price", "feedin_tariff")
+
     def __init__(self, 
-        electricity_price: float, 
-        feedin_tariff: float, 
+        electricity_price, # scalar or time series
+        feedin_tariff, 
         feedin_limit: float = None
     ) -> None:
-        self._electricity_price = electricity_price
-        self._feedin_tariff = feedin_tariff
+        self._electricity_price = tariff(electricity_price)
+        self._feedin_tariff = tariff(feedin_tariff)
         self._feedin_limit = feedin_limit
 
         self.name = "self_consumption" # TODO: name as input argument
@@ -19,8 +22,8 @@ class SelfConsumptionIncrease(AbstractApplication):
     def build(self, block: opt.Model) -> None:
         model = block.model()
 
-        block.electricity_price  = opt.Param(within=opt.NonNegativeReals, initialize=self._electricity_price)
-        block.feedin_tariff      = opt.Param(within=opt.NonNegativeReals, initialize=self._feedin_tariff)
+        add_time_series(block, "electricity_price", self._electricity_price, within=opt.NonNegativeReals)
+        add_time_series(block, "feedin_tariff", self._feedin_tariff, within=opt.NonNegativeReals)
 
         # TODO: implement feedin_limit
         # if self._feedin_limit:
@@ -32,7 +35,6 @@ class SelfConsumptionIncrease(AbstractApplication):
 
         @block.Expression()
         def cost(b):
-            return sum(model.grid[t] * b.electricity_price - model.feedin[t] * b.feedin_tariff for t in model.time) * model.dt
-        
-        # TODO: time-varying prices ?
+            return sum((model.grid[t] * b.electricity_price[t] - model.feedin[t] * b.feedin_tariff[t]) * step_length(model, t) * time_weight(model, t) for t in model.time)
+
 
@@ -0,0 +1,434 @@
+import collections
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+import types
+
+import numpy as np
+import pyomo.environ as opt
+
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.sweep import set_params
+from optses.timeseries import step_lengths, update_param
+
+
+def _feed(hasher, obj, _seen=None) -> None:
+    "Add a canonical representation of `obj` to the hash"
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        hasher.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, np.generic):
+        _feed(hasher, obj.item())
+    elif isinstance(obj, np.ndarray):
+        hasher.update(f"ndarray:{obj.dtype.str}:{obj.shape};".encode())
+        hasher.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(f"{type(obj).__name__}[{len(obj)}];".encode())
+        for item in obj:
+            _feed(hasher, item, _seen)
+    elif isinstance(obj, dict):
+        hasher.update(f"dict[{len(obj)}];".encode())
+        for key in sorted(obj, key=repr):
+            _feed(hasher, key, _seen)
+            _feed(hasher, obj[key], _seen)
+    elif isinstance(obj, types.ModuleType):
+        hasher.update(f"module:{obj.__name__};".encode())
+    elif isinstance(obj, type) or (callable(obj) and hasattr(obj, "__qualname__")):
+        hasher.update(f"callable:{obj.__module__}.{obj.__qualname__};".encode())
+        if isinstance(obj, types.FunctionType):
+            _feed_function(hasher, obj, set() if _seen is None else _seen)
+    elif hasattr(obj, "__dict__"):
+        cls = type(obj)
+        hasher.update(f"object:{cls.__module__}.{cls.__qualname__};".encode())
+        _feed(hasher, vars(obj), _seen)
+    else:
+        raise TypeError(f"Cannot hash objects of type {type(obj).__name__}")
+
+
+def _feed_function(hasher, function, seen: set) -> None:
+    """Code, default arguments, closure contents and referenced globals of a function.
+    Lambdas share their name, all of these tell them apart."""
+    if id(function) in seen:  # recursion
+        return
+    seen.add(id(function))
+
+    names = set()
+    _feed_code(hasher, function.__code__, names)
+    _feed(hasher, function.__defaults__, seen)
+    _feed(hasher, function.__kwdefaults__, seen)
+    cells = []
+    for cell in function.__closure__ or ():
+        try:
+            cells.append(cell.cell_contents)
+        except ValueError:  # empty cell
+            cells.append(None)
+    _feed(hasher, cells, seen)
+    referenced = {name: function.__globals__[name] for name in names if name in function.__globals__}
+    _feed(hasher, referenced, seen)
+
+
+def _feed_code(hasher, code, names: set) -> None:
+    "Bytecode and constants, nested code objects (lambdas, comprehensions) recursively"
+    hasher.update(code.co_code)
+    names.update(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _feed_code(hasher, const, names)
+        else:
+            hasher.update(f"{type(const).__name__}:{const!r};".encode())
+
+
+def fingerprint(*objs) -> str:
+    "Hash of the parameters of model objects (constructor attributes, arrays, nested objects)"
+    hasher = hashlib.sha256()
+    for obj in objs:
+        _feed(hasher, obj)
+    return hasher.hexdigest()
+
+
+# creation time of a disk entry, stored with the arrays of the result
+_CREATED = "__created__"
+
+
+def _structure(application) -> tuple:
+    "Application without its tariff time series, these only change the values of a problem"
+    series = application.series()
+    params = {k: v for k, v in vars(application).items() if k.lstrip("_") not in series}
+    return type(application).__qualname__, params
+
+
+class ModelTemplate:
+    """Model that is built once and reused for scenarios that differ in param values.
+
+    `instance(scenario)` resets all mutable params of the template to their built
+    values and applies the scenario (see `optses.sweep.set_params`), the load and
+    the application tariffs (e.g. `price`), so every instance only differs from the
+    template by its scenario. The returned model is the template itself; `copy` returns an independent
+    clone, e.g. to keep the solution of a scenario.
+    """
+
+    def __init__(self, system: SystemModel, horizon: int = None) -> None:
+        self.system = system
+        self.model = system.build(horizon)
+        self._defaults = [
+            (param, {index: data.value for index, data in param.items()})
+            for param in self.model.component_objects(opt.Param, descend_into=True)
+            if param.mutable
+        ]
+
+    def reset(self) -> None:
+        "Restore the mutable params of the built model"
+        for param, values in self._defaults:
+            param.store_values(values, check=False)
+
+    def instance(self, scenario: dict = None, load=None, **tariffs) -> opt.ConcreteModel:
+        self.reset()
+        model = self.model
+        if load is not None:
+            update_param(model.demand.power, load)
+        self.system.application.update(self.system.application_block(model), **tariffs)
+        if scenario:
+            set_params(model, scenario)
+        return model
+
+    def copy(self, scenario: dict = None, load=None, **tariffs) -> opt.ConcreteModel:
+        model = self.instance(scenario, load=load, **tariffs).clone()
+        self.reset()
+        return model
+
+
+class MatrixCache:
+    """On-disk cache of the constraint matrices of `SparseLP` problems.
+
+    Entries are keyed by a hash of the problem structure: the parameters of the
+    storage, converter, grid and application models, the horizon, the step
+    lengths and weights. The load and the tariff time series are not part of the key,
+    they are applied to the cached problem with `SparseLP.update`. Cached matrices
+    are memory-mapped, so processes sharing the directory share them in the page
+    cache and skip the construction entirely.
+    """
+
+    _MATRICES = ("A_eq", "A_ub")
+    _VECTORS = ("c", "b_eq", "b_ub", "bounds")
+
+    def __init__(self, directory) -> None:
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(system: SystemModel, horizon: int = None) -> str:
+        if horizon is None:
+            horizon = len(system.load.profile)
+        weight = None if system.weight is None else system.weight[:horizon]
+        dt = step_lengths(system.dt, horizon, broadcast=False)
+        return fingerprint(
+            system.storage.cell_model,
+            system.storage.converter_model,
+            system.grid,
+            _structure(system.application),
+            horizon,
+            dt,
+            weight,
+        )
+
+    def get(self, system: SystemModel, horizon: int = None):
+        "Cached problem with the profiles of `system`, built and stored on a miss"
+        from optses.sparse import SparseLP  # scipy is optional
+
+        key = self.key(system, horizon)
+        path = self.directory / key
+        if path.exists():
+            self.hits += 1
+            lp = self.load(system, horizon, path)
+            lp.update(load=system.load.profile, **system.application.series())
+            return lp
+
+        self.misses += 1
+        lp = SparseLP(system, horizon)
+        self.save(lp, path)
+        return lp
+
+    def save(self, lp, path) -> None:
+        path = pathlib.Path(path)
+        # written to a temporary directory first, concurrent writers of a key do not clash
+        tmp = pathlib.Path(tempfile.mkdtemp(dir=self.directory, prefix=".tmp-"))
+        try:
+            for name in self._MATRICES:
+                matrix = getattr(lp, name)
+                for part in ("data", "indices", "indptr"):
+                    np.save(tmp / f"{name}.{part}.npy", getattr(matrix, part))
+            for name in self._VECTORS:
+                np.save(tmp / f"{name}.npy", getattr(lp, name))
+            if hasattr(lp, "_energy_cost"):
+                np.save(tmp / "energy_cost.npy", lp._energy_cost)
+
+            meta = {
+                "horizon": lp.horizon,
+                "variables": {n: [s.start, s.stop] for n, s in lp.variables.items()},
+                "balance": [lp._balance.start, lp._balance.stop],
+                "shapes": {name: list(getattr(lp, name).shape) for name in self._MATRICES},
+            }
+            (tmp / "meta.json").write_text(json.dumps(meta))
+            os.replace(tmp, path)
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not path.exists():
+                raise
+
+    def load(self, system: SystemModel, horizon: int, path):
+        "Problem with memory-mapped matrices, the vectors are loaded into memory"
+        import scipy.sparse as sp
+        from optses.sparse import SparseLP
+
+        path = pathlib.Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+
+        lp = SparseLP(system, meta["horizon"], build=False)
+        lp.variables = {n: slice(*s) for n, s in meta["variables"].items()}
+        lp._n = max(s.stop for s in lp.variables.values())
+        lp._balance = slice(*meta["balance"])
+        for name in self._MATRICES:
+            parts = [np.load(path / f"{name}.{part}.npy", mmap_mode="r") for part in ("data", "indices", "indptr")]
+            setattr(lp, name, sp.csr_matrix(tuple(parts), shape=tuple(meta["shapes"][name]), copy=False))
+        for name in self._VECTORS:
+            setattr(lp, name, np.load(path / f"{name}.npy"))
+        if (path / "energy_cost.npy").exists():
+            lp._energy_cost = np.load(path / "energy_cost.npy")
+        return lp
+
+    def clear(self) -> None:
+        for path in self.directory.iterdir():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class ResultCache:
+    """Memoization of solved problems, keyed by their inputs.
+
+    The key hashes the storage, converter, grid and application parameters, the
+    horizon, step lengths, weights, the load and tariff profiles of the horizon and
+    the solver with its options. Values are the extracted results (`optses.results.extract`) plus
+    the objective, stored as read-only arrays.
+
+    Results are kept in an in-memory LRU tier (`max_items`, `max_bytes`) and, with a
+    `directory`, in a disk tier bounded by `max_disk_bytes` that evicts the oldest
+    entries first. Entries created more than `max_age` seconds ago are dropped
+    from both tiers. `stats` counts hits per tier,
+    misses and evictions.
+    """
+
+    def __init__(
+        self,
+        directory=None,
+        max_items: int = 128,
+        max_bytes: int = 256 * 2**20,
+        max_disk_bytes: int = 2 * 2**30,
+        max_age: float = None,  # s
+    ) -> None:
+        self.directory = None if directory is None else pathlib.Path(directory)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age = max_age
+
+        self._memory = collections.OrderedDict()  # key -> (created, size, result)
+        self._bytes = 0
+        self.stats = dict.fromkeys(("memory_hits", "disk_hits", "misses", "evictions"), 0)
+
+    @staticmethod
+    def key(system: SystemModel, horizon: int = None, solver="highs", components=None, options: dict = None) -> str:
+        if horizon is None:
+            horizon = len(system.load.profile)
+        series = system.application.series()
+        profiles = [
+            None if values is None else values[:horizon]
+            for values in (system.load.profile, system.weight, *series.values())
+        ]
+        return fingerprint(
+            system.storage.cell_model,
+            system.storage.converter_model,
+            system.grid,
+            _structure(system.application),
+            sorted(series),
+            horizon,
+            step_lengths(system.dt, horizon, broadcast=False),
+            profiles,
+            getattr(solver, "name", solver),
+            _solver_options(solver, options),
+            None if components is None else sorted(components),
+        )
+
+    def _expired(self, created: float) -> bool:
+        return self.max_age is not None and time.time() - created > self.max_age
+
+    def get(self, key: str):
+        "Cached result or None"
+        if key in self._memory:
+            created, size, result = self._memory[key]
+            if not self._expired(created):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return result
+            self._drop(key)
+
+        if self.directory is not None:
+            path = self.directory / f"{key}.npz"
+            if path.exists():
+                with np.load(path) as data:
+                    result = {name: data[name] for name in data.files}
+                created = float(result.pop(_CREATED, path.stat().st_mtime))
+                if self._expired(created):
+                    path.unlink(missing_ok=True)
+                else:
+                    result = _read_only(result)
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, result, created)
+                    return result
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, result: dict) -> dict:
+        result = _read_only(result)
+        created = time.time()
+        self._remember(key, result, created)
+        if self.directory is not None:
+            # np.savez appends .npz to names without it
+            tmp = self.directory / f".tmp-{key}-{os.getpid()}.npz"
+            np.savez(tmp, **result, **{_CREATED: created})
+            os.replace(tmp, self.directory / f"{key}.npz")
+            self._evict_disk()
+        return result
+
+    def solve(
+        self, system: SystemModel, horizon: int = None, solver="highs", components=None, options: dict = None
+    ) -> dict:
+        "Extracted results of the system, solved only on a cache miss"
+        from optses.peak import PeakShavingBisection
+        from optses.results import extract
+
+        key = self.key(system, horizon, solver, components, options)
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        if isinstance(solver, PeakShavingBisection):
+            return self.put(key, solver.run(system, horizon, components))
+
+        model = system.build(horizon)
+        results = solver_factory(solver, options=options).solve(model)
+        if not opt.check_optimal_termination(results):
+            raise RuntimeError(
+                f"Solver did not find an optimal solution: {results.solver.termination_condition}"
+            )
+        result = extract(model, components)
+        result["objective"] = np.array(opt.value(model.objective))
+        return self.put(key, result)
+
+    def _remember(self, key: str, result: dict, created: float) -> None:
+        if key in self._memory:
+            self._drop(key)
+        size = sum(v.nbytes for v in result.values())
+        self._memory[key] = (created, size, result)
+        self._bytes += size
+        while self._memory and (len(self._memory) > self.max_items or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._memory)))
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._memory.pop(key)
+        self._bytes -= size
+
+    def _evict_disk(self) -> None:
+        files = []
+        for path in self.directory.glob("*.npz"):
+            if path.name.startswith(".tmp-"):
+                continue
+            stat = path.stat()  # entries are written once, mtime is their creation
+            if self._expired(stat.st_mtime):
+                path.unlink(missing_ok=True)
+                self.stats["evictions"] += 1
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._memory.clear()
+        self._bytes = 0
+        if self.directory is not None:
+            for path in self.directory.glob("*.npz"):
+                path.unlink(missing_ok=True)
+
+
+def _solver_options(solver, options: dict = None) -> dict:
+    "Options of a solver name or instance, and the scalar settings of solver-free engines"
+    settings = {}
+    if not isinstance(solver, str):
+        settings.update(getattr(getattr(solver, "_solver", None), "options", None) or {})
+        settings.update(
+            (name, value) for name, value in vars(solver).items() if isinstance(value, (bool, int, float, str))
+        )
+    settings.update(options or {})
+    return settings
+
+
+def _read_only(result: dict) -> dict:
+    arrays = {name: np.array(value) for name, value in result.items()}
+    for array in arrays.values():
+        array.setflags(write=False)
+    return arrays
@@ -1,15 +1,14 @@
+import pyomo.environ as opt
+
+from optses.timeseries import add_time_series, as_array
+
+
 class Load:
-    def __init__(self, profile):
-        self.profile = profile
+    def __init__(self, profile, column: str = None):
+        self.profile = as_array(profile, column=column)
 
     def build(self, block):
-        model = block.model()
-        block.power = opt.Param(
-            model.time,
-            within=opt.Reals,
-            mutable=True,
-            initialize=lambda b, t: self.profile.iloc[t],
-        )
+        add_time_series(block, "power", self.profile)
 
 
 class Grid:
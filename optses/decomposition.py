@@ -0,0 +1,203 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+import pyomo.environ as opt
+
+from optses.application.peak_shaving import PeakShaving
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.storage.erm import EnergyReservoirModel
+from optses.timeseries import update_param
+
+
+# state of a worker process, models are built once per block length
+_worker = {}
+
+
+def _init_worker(system, solver) -> None:
+    _worker["system"] = system
+    _worker["solver"] = solver
+    _worker["models"] = {}
+
+
+def _block_model(length: int):
+    models = _worker["models"]
+    if length not in models:
+        model = _worker["system"].build(length)
+        model.dual = opt.Suffix(direction=opt.Suffix.IMPORT)
+
+        # inner blocks end exactly at the start of the next block, the last one at least at soc_end
+        storage = model.storage
+        storage.soc_end_max = opt.Param(within=opt.NonNegativeReals, initialize=1.0, mutable=True)
+        storage.soc_end_upper = opt.Constraint(
+            expr=storage.soc[model.time.last()] <= storage.soc_end_max * storage.capacity
+        )
+        models[length] = (model, solver_factory(_worker["solver"]))
+    return models[length]
+
+
+def _solve_block(task) -> dict:
+    k, start, length, soc_start, soc_end, last = task
+    system = _worker["system"]
+    model, solver = _block_model(length)
+
+    window = slice(start, start + length)
+    update_param(model.demand.power, system.load.profile[window])
+    tariffs = {name: values[window] for name, values in system.application.series().items()}
+    system.application.update(system.application_block(model), **tariffs)
+    model.storage.soc_start = soc_start
+    model.storage.soc_end = soc_end
+    model.storage.soc_end_max = 1.0 if last else soc_end
+
+    results = solver.solve(model)
+    if not opt.check_optimal_termination(results):
+        return {"block": k, "feasible": False}
+
+    storage = model.storage
+    capacity = opt.value(storage.capacity)
+    first, last = model.time.first(), model.time.last()
+    return {
+        "block": k,
+        "feasible": True,
+        "objective": opt.value(model.objective),
+        # sensitivities of the block objective to its boundary socs
+        "d_start": model.dual[storage.soc_balance_constraint[first]] * capacity,
+        "d_end": (model.dual[storage.soc_end_constraint] + model.dual[storage.soc_end_upper]) * capacity,
+        "soc": np.array([system.storage.state_of_charge(storage, t) for t in model.time]),
+        "power": np.array([opt.value(storage.power[t]) for t in model.time]),
+        "grid": np.array([opt.value(model.grid[t] - model.feedin[t]) for t in model.time]),
+    }
+
+
+class TemporalDecomposition:
+    """Splits a long horizon into blocks that are solved in parallel.
+
+    Blocks are coupled only through their boundary socs: block k starts at
+    `soc_start = boundaries[k]` and ends at `boundaries[k+1]`, so the concatenated
+    schedule is continuous. The last block has to end with at least `soc_end`.
+    Without iterations all boundaries equal the initial soc (fixed-boundary
+    heuristic). With `iterations > 0` the boundaries are coordinated with a
+    projected subgradient method on the duals of the boundary constraints.
+
+    The objective is the sum of the block objectives, which requires an
+    application that is separable in time (e.g. `Arbitrage`). Horizon-coupled
+    costs like the peak of `PeakShaving` are not supported.
+    """
+
+    def __init__(
+        self,
+        system: SystemModel,
+        block_length: int,
+        solver="highs",
+        processes: int = None,
+        iterations: int = 0,
+        step_size: float = 0.1,  # largest boundary move in the first iteration (soc fraction)
+        tol: float = 1e-6,
+    ) -> None:
+        if not isinstance(system.storage.cell_model, EnergyReservoirModel):
+            raise TypeError("Temporal decomposition requires an EnergyReservoirModel")
+        if np.ndim(system.dt) != 0:
+            raise ValueError("Temporal decomposition requires a uniform time grid")
+        if isinstance(system.application, PeakShaving):
+            raise TypeError("The peak of PeakShaving couples all blocks, it cannot be decomposed")
+
+        self.system = system
+        self.block_length = block_length
+        self.solver = solver
+        self.processes = processes
+        self.iterations = iterations
+        self.step_size = step_size
+        self.tol = tol
+
+    def blocks(self, horizon: int) -> list:
+        "(start, length) of the blocks"
+        starts = range(0, horizon, self.block_length)
+        return [(start, min(self.block_length, horizon - start)) for start in starts]
+
+    def _solve_blocks(self, pool, blocks, boundaries) -> list:
+        tasks = [
+            (k, start, length, boundaries[k], boundaries[k + 1], k == len(blocks) - 1)
+            for k, (start, length) in enumerate(blocks)
+        ]
+        return sorted(pool.map(_solve_block, tasks), key=lambda r: r["block"])
+
+    def run(self, monolithic: bool = True) -> dict:
+        horizon = len(self.system.load.profile)
+        blocks = self.blocks(horizon)
+
+        cell = self.system.storage.cell_model
+        soc_min, soc_max = cell._soc_bounds
+        boundaries = np.full(len(blocks) + 1, cell._soc_start)
+        boundaries[-1] = cell._soc_end
+
+        start_time = time.perf_counter()
+        history = []
+        with multiprocessing.Pool(
+            processes=self.processes,
+            initializer=_init_worker,
+            initargs=(self.system, self.solver),
+        ) as pool:
+            best = self._solve_blocks(pool, blocks, boundaries)
+            if not all(r["feasible"] for r in best):
+                raise RuntimeError("Fixed-boundary decomposition is infeasible")
+            best_objective = sum(r["objective"] for r in best)
+            best_boundaries = boundaries.copy()
+            history.append(best_objective)
+
+            step = self.step_size
+            for i in range(self.iterations):
+                # gradient of the total objective w.r.t. the inner boundaries
+                gradient = np.array(
+                    [best[k - 1]["d_end"] + best[k]["d_start"] for k in range(1, len(blocks))]
+                )
+                scale = np.abs(gradient).max() if len(gradient) else 0.0
+                if scale < self.tol:
+                    break
+
+                boundaries = best_boundaries.copy()
+                boundaries[1:-1] = np.clip(
+                    boundaries[1:-1] - step / np.sqrt(i + 1) * gradient / scale,
+                    soc_min,
+                    soc_max,
+                )
+                results = self._solve_blocks(pool, blocks, boundaries)
+
+                if not all(r["feasible"] for r in results):
+                    step /= 2
+                    history.append(np.nan)
+                    continue
+
+                objective = sum(r["objective"] for r in results)
+                history.append(objective)
+                if objective < best_objective - self.tol * abs(best_objective):
+                    best, best_objective, best_boundaries = results, objective, boundaries
+                else:
+                    step /= 2
+        elapsed = time.perf_counter() - start_time
+
+        schedule = pd.DataFrame(
+            {name: np.concatenate([r[name] for r in best]) for name in ("soc", "power", "grid")}
+        )
+        result = {
+            "objective": best_objective,
+            "boundaries": best_boundaries,
+            "history": history,
+            "time": elapsed,
+            "schedule": schedule,
+        }
+
+        if monolithic:
+            start_time = time.perf_counter()
+            model = self.system.build(horizon)
+            results = solver_factory(self.solver).solve(model)
+            if not opt.check_optimal_termination(results):
+                raise RuntimeError("Monolithic solve failed")
+            reference = opt.value(model.objective)
+
+            result["monolithic_objective"] = reference
+            result["monolithic_time"] = time.perf_counter() - start_time
+            result["gap"] = (best_objective - reference) / max(abs(reference), 1e-9)
+
+        return result
@@ -0,0 +1,191 @@
+import numpy as np
+
+from optses.application.arbitrage import Arbitrage
+from optses.model import SystemModel, check_linear_system
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.erm import EnergyReservoirModel
+from optses.timeseries import as_array, step_lengths
+
+
+class ArbitrageDP:
+    """Dynamic programming for `Arbitrage` with one `EnergyReservoirModel` and an
+    ideal or constant efficiency converter, batched over price scenarios.
+
+    The stored energy is discretized into at least `levels` equidistant values
+    between the soc bounds, one of them the initial soc. A transition between two
+    levels is feasible if the energy change plus self-discharge can be charged or
+    discharged within the power limit, its cost is the price of the resulting ac
+    power. The backward recursion runs on arrays of shape (prices, levels), one
+    vectorized step per level offset.
+
+    The final soc must reach `soc_end` on the grid and the discharge power limit
+    is used up to `tol`, so every schedule is feasible for the LP and the optimum
+    approaches the LP optimum with finer grids (see `compare`). Charging and
+    discharging at the same time, which the LP uses to burn energy at negative
+    prices, is not modelled.
+    """
+
+    name = "dp"
+
+    def __init__(self, levels: int = 101, tol: float = 1e-3) -> None:
+        if levels < 2:
+            raise ValueError("levels must be at least 2")
+        self.levels = levels
+        self.tol = tol  # of the discharge power limit lost to the grid
+
+    def grid(self, system: SystemModel, dt: float) -> np.ndarray:
+        """Stored energy of at least `levels` levels through the initial soc. The
+        spacing divides the energy of a full-power charge step and, up to
+        `self.tol`, of a full-power discharge step, so both limits are transitions."""
+        cell = system.storage.cell_model
+        soc_min, soc_max = cell._soc_bounds
+        span = (soc_max - soc_min) * cell._capacity
+        if span <= 0:
+            raise ValueError("soc bounds must span a positive energy range")
+
+        step = span / (self.levels - 1)
+        charge = dt * (cell._power * cell._effc - cell._psd)
+        discharge = dt * (cell._power / cell._effd + cell._psd)
+        if charge > 0:
+            # charge steps per limit, the first that also fits the discharge limit
+            counts = np.arange(np.ceil(charge / step), 4 * np.ceil(charge / step) + 1)
+            used = np.floor(discharge / charge * counts + 1e-9) / (discharge / charge * counts)
+            fits = np.flatnonzero(used >= 1 - self.tol)
+            step = charge / counts[fits[0] if len(fits) else used.argmax()]
+
+        start = cell._soc_start * cell._capacity
+        below = int((start - soc_min * cell._capacity) / step + 1e-9)
+        above = int((soc_max * cell._capacity - start) / step + 1e-9)
+        return start + step * np.arange(-below, above + 1)
+
+    def _transitions(self, system: SystemModel, energy: np.ndarray, dt: np.ndarray) -> tuple:
+        "Level offsets and the ac power of each (time step, offset), nan if infeasible"
+        cell = system.storage.cell_model
+        converter = system.storage.converter_model
+        ce, cd = (converter._effc, converter._effd) if isinstance(converter, ConstantEfficiencyConverter) else (1.0, 1.0)
+
+        n = len(energy)
+        step = energy[1] - energy[0]
+        lowest = np.floor(dt.max() * (-cell._power / cell._effd - cell._psd) / step)
+        highest = np.ceil(dt.max() * (cell._power * cell._effc - cell._psd) / step)
+        offsets = np.arange(max(lowest, 1 - n), min(highest, n - 1) + 1).astype(int)
+
+        # change of the stored energy before self-discharge
+        energy = offsets[None, :] * step + dt[:, None] * cell._psd
+        pc = np.clip(energy, 0.0, None) / (dt[:, None] * cell._effc)
+        pd = np.clip(-energy, 0.0, None) * cell._effd / dt[:, None]
+        tol = 1e-9 * max(cell._power, 1.0)
+        ac = np.where((pc <= cell._power + tol) & (pd <= cell._power + tol), pc / ce - pd * cd, np.nan)
+        return offsets, ac
+
+    def solve_prices(self, system: SystemModel, prices, horizon: int = None) -> dict:
+        """Optimal schedules for every row of `prices` (scenarios x time steps), as
+        arrays (scenarios x time) and the `objective` per scenario"""
+        check_linear_system(system, cells=(EnergyReservoirModel,), applications=(Arbitrage,))
+        cell = system.storage.cell_model
+        prices = np.atleast_2d(np.asarray(prices, dtype=float))
+        if horizon is None:
+            horizon = prices.shape[1]
+        prices = prices[:, :horizon]
+        n_prices = len(prices)
+        load = as_array(system.load.profile)[:horizon]
+        dt = step_lengths(system.dt, horizon)
+        weight = np.ones(horizon) if system.weight is None else system.weight[:horizon]
+
+        energy = self.grid(system, dt[0])
+        offsets, ac = self._transitions(system, energy, dt)
+        n = len(energy)
+
+        # backward recursion, value[:, i] is the cost to go from level i
+        value = np.where(energy >= cell._soc_end * cell._capacity - 1e-9 * cell._capacity, 0.0, np.inf)
+        value = np.broadcast_to(value, (n_prices, n)).copy()
+        choice = np.empty((horizon, n_prices, n), dtype=np.intp)
+        for t in range(horizon - 1, -1, -1):
+            best = np.full((n_prices, n), np.inf)
+            arg = np.zeros((n_prices, n), dtype=np.intp)
+            for k, d in enumerate(offsets):
+                if np.isnan(ac[t, k]):
+                    continue
+                # from level i to i + d
+                lo, hi = max(0, -d), min(n, n - d)
+                candidate = value[:, lo + d : hi + d] + (prices[:, t] * ac[t, k] * dt[t] * weight[t])[:, None]
+                better = candidate < best[:, lo:hi]
+                best[:, lo:hi] = np.where(better, candidate, best[:, lo:hi])
+                arg[:, lo:hi] = np.where(better, k, arg[:, lo:hi])
+            value = best
+            choice[t] = arg
+
+        # forward pass from the level closest to the initial soc
+        start = int(np.abs(energy - cell._soc_start * cell._capacity).argmin())
+        level = np.full(n_prices, start)
+        rows = np.arange(n_prices)
+        feasible = np.isfinite(value[:, start])
+        soc = np.empty((n_prices, horizon))
+        power = np.empty((n_prices, horizon))
+        for t in range(horizon):
+            k = choice[t, rows, level]
+            power[:, t] = ac[t, k]
+            level = level + offsets[k]
+            soc[:, t] = energy[level]
+
+        storage_cost = (prices * power * dt * weight).sum(axis=1)
+        load_cost = (prices * load * dt * weight).sum(axis=1)
+        grid = load + power
+        result = {
+            "grid": np.clip(grid, 0.0, None),
+            "feedin": np.clip(-grid, 0.0, None),
+            "storage.soc": soc,
+            "storage.power": power,
+            "grid_connection.power": grid,
+            "objective": np.where(feasible, storage_cost + load_cost, np.nan),
+        }
+        for values in result.values():
+            if values.ndim == 2:
+                values[~feasible] = np.nan
+        return result
+
+    def run(self, system: SystemModel, horizon: int = None, components=None) -> dict:
+        "Results of one system in the structure of `optses.results.extract` plus the objective"
+        price = system.application._price
+        if price is None:
+            raise ValueError("Arbitrage requires a price")
+        if horizon is None:
+            horizon = len(system.load.profile)
+        result = self.solve_prices(system, np.broadcast_to(price, horizon)[None, :horizon], horizon)
+        if np.isnan(result["objective"][0]):
+            raise RuntimeError("Arbitrage problem is infeasible on the soc grid")
+        return {
+            name: values[0] if values.ndim == 2 else np.array(values[0])
+            for name, values in result.items()
+            if components is None or name in components or name.rsplit(".", 1)[-1] in components or name == "objective"
+        }
+
+    def compare(self, system: SystemModel, prices, horizon: int = None) -> dict:
+        "DP and LP (`SparseLP`) objectives of every price scenario and their relative gap"
+        from optses.sparse import SparseLP  # scipy is optional
+
+        result = self.solve_prices(system, prices, horizon)
+        prices = np.atleast_2d(np.asarray(prices, dtype=float))
+        if horizon is None:
+            horizon = prices.shape[1]
+
+        scenario = SystemModel(
+            storage=system.storage,
+            application=system.application.with_tariffs(price=prices[0]),
+            load=system.load,
+            grid=system.grid,
+            dt=system.dt,
+            weight=system.weight,
+        )
+        lp = SparseLP(scenario, horizon)
+        optimum = np.empty(len(prices))
+        for i, price in enumerate(prices):
+            lp.update(price=price)
+            optimum[i] = lp.solve().fun
+
+        dp = result["objective"]
+        return {
+            "dp": dp,
+            "lp": optimum,
+            "gap": (dp - optimum) / np.maximum(np.abs(optimum), 1e-12),
+        }
@@ -0,0 +1,306 @@
+import copy
+import re
+import tempfile
+import time
+
+import numpy as np
+import pyomo.environ as opt
+from pyomo.util.calc_var_value import calculate_variable_from_constraint
+
+from optses.model import SystemModel
+from optses.piecewise import convex_envelope, evaluate_envelope
+from optses.results import values
+from optses.solver import solver_factory
+from optses.storage.converter import (
+    ConstantEfficiencyConverter,
+    IdealConverter,
+    NottonLossConverter,
+    QuadraticLossConverter,
+    RampinelliFitConverter,
+)
+from optses.storage.ecm import RintModel
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+from optses.timeseries import step_length
+
+# charge and discharge AC power variables and their loss variables (`segments`) per loss converter
+_CONVERTER_VARS = {
+    NottonLossConverter: (("power_c", "loss_c"), ("power_d", "loss_d")),
+    RampinelliFitConverter: (("pec", "loss_c"), ("ped", "loss_d")),
+}
+_CONVERTER_CONSTRAINTS = ("converter_efficiency", "converter_loss_constraint", "converter_efficiency_constraint")
+
+
+class SurrogateInitializer:
+    """Starting point for NLP solves of `RintModel` systems from a linear surrogate.
+
+    The surrogate replaces the cell by an `EnergyReservoirModel` with the energy
+    capacity, power limits, efficiency and soc range of the cell (at its mean
+    ocv), and the loss converters by their convex piecewise linear mode with
+    `segments`. Its LP optimum is mapped onto consistent values of all cell and
+    converter variables: currents that reproduce the soc trajectory, ocv, terminal
+    voltage and cell power, and the converter AC power solved from its (nonlinear)
+    loss constraint with `calculate_variable_from_constraint`. Grid and
+    application variables follow from the power balance.
+
+    `compare` solves a system cold and initialized and reports the iterations
+    and times of both.
+    """
+
+    def __init__(self, solver="highs", segments: int = 16, voltage: float = None) -> None:
+        self.solver = solver
+        self.segments = segments
+        self.voltage = voltage  # nominal cell voltage, required for ocv rules
+
+    def nominal_voltage(self, cell: RintModel) -> float:
+        "Mean ocv over the soc range of the cell"
+        if self.voltage is not None:
+            return self.voltage
+        if callable(cell._ocv):
+            raise ValueError("voltage is required for cells with an ocv rule")
+        soc = np.linspace(*cell._soc_bounds, 101)
+        return float(np.interp(soc, *cell._ocv).mean())
+
+    def surrogate(self, system: SystemModel) -> SystemModel:
+        "System with the linear surrogate of the storage"
+        cell = system.storage.cell_model
+        if not isinstance(cell, RintModel):
+            raise TypeError(f"Unsupported storage model: {type(cell).__name__}")
+
+        scale = self.nominal_voltage(cell) * cell._parallel * cell._serial  # A per cell -> W per pack
+        power = min(cell._i_bounds) * scale
+        rating = _dc_rating(system.storage.converter_model)
+        if rating is not None:
+            power = min(power, rating)  # the AC power stays within the converter rating
+        surrogate_cell = EnergyReservoirModel(
+            capacity=cell._capacity * scale,
+            power=power,
+            soc_start=cell._soc_start,
+            soc_bounds=cell._soc_bounds,
+            effc=cell._eff,
+            soc_end=cell._soc_bounds[0],  # the cell has no end constraint
+        )
+
+        converter = system.storage.converter_model
+        if getattr(converter, "_segments", False) is None:
+            converter = copy.copy(converter)
+            converter._segments = self.segments
+
+        return SystemModel(
+            storage=StorageSystem(surrogate_cell, converter),
+            application=system.application,
+            load=system.load,
+            grid=system.grid,
+            dt=system.dt,
+            weight=system.weight,
+        )
+
+    def trajectory(self, system: SystemModel, horizon: int = None) -> opt.ConcreteModel:
+        "Solved surrogate model"
+        model = self.surrogate(system).build(horizon)
+        results = solver_factory(self.solver).solve(model)
+        if not opt.check_optimal_termination(results):
+            raise RuntimeError(f"Surrogate solve failed: {results.solver.termination_condition}")
+        return model
+
+    def initialize(self, model: opt.ConcreteModel, system: SystemModel, surrogate: opt.ConcreteModel = None) -> None:
+        "Set the variables of the built model from the surrogate solution"
+        if surrogate is None:
+            surrogate = self.trajectory(system, len(model.time))
+
+        cell = system.storage.cell_model
+        block = model.storage
+        soc = values(surrogate.storage.soc) / opt.value(surrogate.storage.capacity)
+        self._initialize_cell(cell, block, np.clip(soc, *cell._soc_bounds), self.nominal_voltage(cell))
+        self._initialize_converter(system.storage.converter_model, block)
+
+        # everything outside the storage as in the surrogate, the grid from the power balance
+        for var in surrogate.component_data_objects(opt.Var, descend_into=True):
+            if var.parent_block() is surrogate.storage or var.value is None:
+                continue
+            target = model.find_component(var.name)
+            if target is not None and not target.fixed:
+                target.set_value(var.value, skip_validation=True)
+        for t in model.time:
+            grid = opt.value(model.demand.power[t] + block.power[t])
+            model.grid[t].set_value(max(grid, 0.0))
+            model.feedin[t].set_value(max(-grid, 0.0))
+        application = system.application_block(model)
+        if hasattr(application, "peak"):
+            application.peak.set_value(max(application.peak.value or 0.0, max(model.grid[t].value for t in model.time)))
+
+    @staticmethod
+    def _initialize_cell(cell: RintModel, block, soc: np.ndarray, voltage: float) -> None:
+        model = block.model()
+        capacity = opt.value(block.cell_capacity)
+        effc, effd = opt.value(block.effc), opt.value(block.effd)
+        r0 = opt.value(block.r0)
+        i_max_c, i_max_d = cell._i_bounds
+
+        # currents that reproduce the soc trajectory within the current bounds
+        level = opt.value(block.soc_start)
+        for k, t in enumerate(model.time):
+            dt = opt.value(step_length(model, t))
+            change = (soc[k] - level) * capacity / dt
+            ic = min(max(change, 0.0) / effc, i_max_c)
+            id = min(max(-change, 0.0) * effd, i_max_d)
+            level += dt * (ic * effc - id / effd) / capacity
+
+            block.ic[t].set_value(ic)
+            block.id[t].set_value(id)
+            block.soc[t].set_value(level)
+
+            if callable(cell._ocv):
+                block.ocv[t].set_value(voltage)
+                calculate_variable_from_constraint(block.ocv[t], block.ocv_constraint[t])
+            else:
+                block.ocv[t].set_value(float(np.interp(level, *cell._ocv)))
+            v = block.ocv[t].value + r0 * (ic - id)
+            block.v[t].set_value(v, skip_validation=True)
+            block.cell_power[t].set_value(v * (ic - id))
+
+    @staticmethod
+    def _initialize_converter(converter, block) -> None:
+        model = block.model()
+        if isinstance(converter, IdealConverter):
+            return
+
+        time = list(model.time)
+        power_dc = np.array([opt.value(block.power_dc[t]) for t in time])
+        if isinstance(converter, ConstantEfficiencyConverter):
+            _set_values(block.pec, time, np.maximum(power_dc, 0.0) / converter._effc)
+            _set_values(block.ped, time, np.maximum(-power_dc, 0.0) * converter._effd)
+            return
+
+        curves = _loss_curves(converter)
+        ac = _ac_power(converter, curves, power_dc)
+        if isinstance(converter, QuadraticLossConverter):
+            powers = {"power": ac}
+            losses = {"converter_loss": curves[0](ac)}
+        else:
+            (charge, charge_loss), (discharge, discharge_loss) = next(
+                v for cls, v in _CONVERTER_VARS.items() if isinstance(converter, cls)
+            )
+            powers = {charge: np.maximum(ac, 0.0), discharge: np.maximum(-ac, 0.0)}
+            losses = {charge_loss: curves[0](powers[charge]), discharge_loss: curves[1](powers[discharge])}
+
+        if getattr(converter, "_segments", None):
+            # the losses on their envelopes satisfy the LP constraints exactly
+            for name, value in {**powers, **losses}.items():
+                _set_values(block.component(name), time, value)
+            return
+
+        # polish the active power on the nonlinear constraint; the fit efficiencies are
+        # undefined at zero power, both powers stay above `floor` with a standby loss
+        floor, idle = 0.0, 0.0
+        if isinstance(converter, RampinelliFitConverter):
+            floor = 1e-6 * converter._power
+            efficiency = converter.efficiency(floor)
+            idle = floor * efficiency - floor / efficiency  # DC power with both at the floor
+        for name, value in powers.items():
+            _set_values(block.component(name), time, np.maximum(value, floor))
+        constraint = next(block.component(name) for name in _CONVERTER_CONSTRAINTS if hasattr(block, name))
+        for k, t in enumerate(time):
+            if power_dc[k] == idle:
+                continue
+            var = block.component(list(powers)[0 if len(powers) == 1 or power_dc[k] >= idle else 1])[t]
+            calculate_variable_from_constraint(var, constraint[t])
+            var.set_value(_clip(var, var.value))
+
+    def compare(self, system: SystemModel, horizon: int = None, solver: str = "ipopt", options: dict = None) -> dict:
+        "Iterations and times of a cold and an initialized NLP solve"
+        report = {}
+        for name in ("cold", "initialized"):
+            model = system.build(horizon)
+            start = time.perf_counter()
+            if name == "initialized":
+                self.initialize(model, system)
+            report[f"{name}_initialization_time"] = time.perf_counter() - start
+
+            nlp = opt.SolverFactory(solver)
+            nlp.options.update(options or {})
+            with tempfile.NamedTemporaryFile(suffix=".log") as log:
+                start = time.perf_counter()
+                results = nlp.solve(model, logfile=log.name)
+                report[f"{name}_solve_time"] = time.perf_counter() - start
+                with open(log.name) as file:
+                    report[f"{name}_iterations"] = _iterations(file.read())
+            report[f"{name}_termination"] = str(results.solver.termination_condition)
+            report[f"{name}_objective"] = (
+                opt.value(model.objective) if opt.check_optimal_termination(results) else np.nan
+            )
+
+        report["iteration_savings"] = report["cold_iterations"] - report["initialized_iterations"]
+        report["time_savings"] = (
+            report["cold_solve_time"]
+            - report["initialized_solve_time"]
+            - report["initialized_initialization_time"]
+        )
+        return report
+
+
+def _iterations(log: str) -> float:
+    "Iteration count of an ipopt log, nan if not found"
+    match = re.search(r"Number of Iterations\.*:\s*(\d+)", log)
+    return int(match.group(1)) if match else np.nan
+
+
+def _loss_curves(converter) -> tuple:
+    "Charge and discharge loss of the converter at AC power, on their envelopes with `segments`"
+    if isinstance(converter, QuadraticLossConverter):
+        curves, lower = (converter.loss,), -converter._power  # signed AC power
+    elif isinstance(converter, NottonLossConverter):
+        curves, lower = (converter.loss, converter.loss), 0.0
+    else:
+        curves, lower = (converter.loss_charge, converter.loss_discharge), 0.0
+    if not converter._segments:
+        return curves
+    envelopes = [convex_envelope(curve, lower, converter._power, converter._segments) for curve in curves]
+    return tuple(lambda power, e=e: evaluate_envelope(*e, power) for e in envelopes)
+
+
+def _dc_power(curves: tuple, ac):
+    "DC power at the AC power (positive when charging)"
+    if len(curves) == 1:
+        return ac - curves[0](ac)
+    charge, discharge = np.maximum(ac, 0.0), np.maximum(-ac, 0.0)
+    return charge - curves[0](charge) - discharge - curves[1](discharge)
+
+
+def _dc_rating(converter) -> float:
+    "Largest DC power of a loss converter within its AC rating in both directions, None without rating"
+    if not isinstance(converter, (QuadraticLossConverter, NottonLossConverter, RampinelliFitConverter)):
+        return None
+    converter = copy.copy(converter)
+    converter._segments = None  # the true losses are above their envelopes
+    curves = _loss_curves(converter)
+    return float(min(_dc_power(curves, converter._power), -_dc_power(curves, -converter._power)))
+
+
+def _ac_power(converter, curves: tuple, power_dc: np.ndarray, iterations: int = 60) -> np.ndarray:
+    "AC power (positive when charging) at the DC power, by bisection on the loss curves"
+    # the DC power increases with the AC power
+    lower = np.full_like(power_dc, -converter._power)
+    upper = np.full_like(power_dc, converter._power)
+    for _ in range(iterations):
+        middle = (lower + upper) / 2
+        below = _dc_power(curves, middle) < power_dc
+        lower = np.where(below, middle, lower)
+        upper = np.where(below, upper, middle)
+    return (lower + upper) / 2
+
+
+def _clip(var, value: float) -> float:
+    "Value clipped to the bounds of the variable"
+    lb, ub = var.bounds
+    if lb is not None:
+        value = max(value, lb)
+    if ub is not None:
+        value = min(value, ub)
+    return float(value)
+
+
+def _set_values(var, index, values) -> None:
+    "Set the values of an indexed variable, clipped to its bounds"
+    for i, value in zip(index, values):
+        var[i].set_value(_clip(var[i], value))
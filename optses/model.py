@@ -0,0 +1,102 @@
+import numpy as np
+import pyomo.environ as opt
+
+from optses.application.abstract_application import AbstractApplication
+from optses.coupling import Grid, Load
+from optses.profiling import profiled
+from optses.storage.converter import ConstantEfficiencyConverter, IdealConverter
+from optses.storage.system import StorageSystem
+from optses.timeseries import add_time_series, as_array
+
+
+class SystemModel:
+    "Couples load, grid connection, storage system and application into one model"
+
+    def __init__(
+        self,
+        storage: StorageSystem,
+        application: AbstractApplication,
+        load: Load,
+        grid: Grid = None,
+        dt=0.25,  # h, scalar or one value per time step
+        price=None,  # shorthand for the price of `Arbitrage`
+        weight=None,
+    ) -> None:
+        if grid is None:
+            grid = Grid()
+
+        if price is not None:
+            application = application.with_tariffs(price=price)
+
+        self.storage = storage
+        self.application = application
+        self.load = load
+        self.grid = grid
+        self.dt = dt if np.ndim(dt) == 0 else as_array(dt)
+        self.weight = None if weight is None else as_array(weight)  # time step weights in the costs
+
+    def build(self, horizon: int = None) -> opt.ConcreteModel:
+        if horizon is None:
+            horizon = len(self.load.profile)
+
+        model = opt.ConcreteModel()
+        with profiled("SystemModel.build", model):
+            self._build(model, horizon)
+        return model
+
+    def _build(self, model: opt.ConcreteModel, horizon: int) -> None:
+        model.time = opt.RangeSet(0, horizon - 1)
+        if np.ndim(self.dt) == 0:
+            model.dt = opt.Param(within=opt.PositiveReals, initialize=self.dt)
+        else:
+            add_time_series(model, "dt", self.dt, within=opt.PositiveReals)
+
+        if self.weight is not None:
+            add_time_series(model, "weight", self.weight, within=opt.NonNegativeReals)
+
+        model.demand = opt.Block()
+        with profiled(type(self.load).__name__, model.demand):
+            self.load.build(model.demand)
+
+        model.storage = opt.Block()
+        with profiled(type(self.storage).__name__, model.storage):
+            self.storage.build(model.storage)
+
+        model.grid_connection = opt.Block()
+        with profiled(type(self.grid).__name__, model.grid_connection):
+            self.grid.build(model.grid_connection)
+        model.grid = opt.Reference(model.grid_connection.power_buy)
+        model.feedin = opt.Reference(model.grid_connection.power_sell)
+
+        @model.Constraint(model.time)
+        def power_balance(m, t):
+            return m.grid_connection.power[t] == m.demand.power[t] + m.storage.power[t]
+
+        application = opt.Block()
+        model.add_component(self.application.name, application)
+        with profiled(type(self.application).__name__, application):
+            self.application.build(application)
+
+        model.objective = opt.Objective(
+            expr=sum(b.cost for b in (model.storage, application) if hasattr(b, "cost")),
+            sense=opt.minimize,
+        )
+
+    def application_block(self, model: opt.ConcreteModel):
+        return model.component(self.application.name)
+
+
+def check_linear_system(system: SystemModel, cells: tuple, applications: tuple) -> None:
+    """Raise a TypeError unless the cell model is one of `cells` (exact types), the
+    converter ideal or of constant efficiency, the grid a plain `Grid` and the
+    application one of `applications`, as the solver-free backends require"""
+    cell = system.storage.cell_model
+    converter = system.storage.converter_model
+    if type(cell) not in cells:
+        raise TypeError(f"Unsupported storage model: {type(cell).__name__}")
+    if not isinstance(converter, (IdealConverter, ConstantEfficiencyConverter)):
+        raise TypeError(f"Unsupported converter model: {type(converter).__name__}")
+    if type(system.grid) is not Grid:
+        raise TypeError(f"Unsupported grid model: {type(system.grid).__name__}")
+    if not isinstance(system.application, applications):
+        raise TypeError(f"Unsupported application: {type(system.application).__name__}")
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pyomo.environ as opt
+
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.timeseries import as_array, resample, update_param
+
+
+class RollingHorizon:
+    """Receding-horizon optimization on a single built model.
+
+    The model is built once for `horizon` steps. For every window only the mutable
+    params (load, the application tariffs and storage `soc_start`) are updated in
+    place before the re-solve, and the first `step` decisions of each window are
+    committed. Tariffs the application holds as time series are windowed like the
+    load unless other profiles are passed to `run`, e.g. `run(load, price=forecast)`.
+
+    With a non-uniform time grid (`system.dt` as array) the profiles are given at
+    the resolution of the first model step and resampled to the grid of every
+    window. The committed steps have to be at this base resolution.
+    """
+
+    def __init__(
+        self,
+        system: SystemModel,
+        horizon: int,
+        step: int = 1,
+        solver="highs",
+    ) -> None:
+        if step > horizon:
+            raise ValueError("step must not be larger than the horizon")
+
+        self.system = system
+        self.horizon = horizon
+        self.step = step
+        self.solver = solver_factory(solver)
+
+        self.model = None
+        self._initial = {}  # built soc_start and soc_end, restored at the start of every run
+
+        dt = system.dt
+        if np.ndim(dt) == 0:
+            self.base_dt = dt
+            self.counts = np.ones(horizon, dtype=int)
+        else:
+            if len(dt) < horizon:
+                raise ValueError("dt has less values than the horizon")
+            self.base_dt = dt[0]
+            self.counts = np.rint(dt[:horizon] / self.base_dt).astype(int)
+            if np.any(self.counts[:step] != 1):
+                raise ValueError("The committed steps must have the base resolution dt[0]")
+
+    @property
+    def span(self) -> int:
+        "Number of base-resolution values covered by one window"
+        return int(self.counts.sum())
+
+    def window(self, profile, start: int) -> np.ndarray:
+        "Values of a base-resolution profile on the time grid of the window at `start`"
+        values = profile[start : start + self.span]
+        if self.span == self.horizon:
+            return values
+        return resample(values, self.system.dt[: self.horizon], self.base_dt)
+
+    def build(self) -> opt.ConcreteModel:
+        if self.model is None:
+            self.model = self.system.build(self.horizon)
+            self._initial = {
+                name: self.model.storage.component(name).extract_values()
+                for name in ("soc_start", "soc_end")
+                if hasattr(self.model.storage, name)
+            }
+        return self.model
+
+    def reset(self) -> None:
+        "Restore the initial soc_start and soc_end of the storage"
+        model = self.build()
+        for name, value in self._initial.items():
+            model.storage.component(name).store_values(value)
+
+    def update(self, load, price=None, soc_start: float = None, **tariffs) -> None:
+        "Update the mutable params of the built model with the values of one window"
+        model = self.build()
+
+        update_param(model.demand.power, load)
+        if price is not None:
+            tariffs["price"] = price
+        self.system.application.update(self.system.application_block(model), **tariffs)
+
+        if soc_start is not None:
+            model.storage.soc_start = soc_start
+            if hasattr(model.storage, "soc_end"):
+                # the window has to end at least at its initial soc
+                model.storage.soc_end = soc_start
+
+    def solve(self):
+        results = self.solver.solve(self.model)
+        if not opt.check_optimal_termination(results):
+            raise RuntimeError(
+                f"Solver did not find an optimal solution: {results.solver.termination_condition}"
+            )
+        return results
+
+    def run(self, load, price=None, soc_start: float = None, **tariffs) -> pd.DataFrame:
+        "Optimize over all windows of the profiles and return the committed decisions"
+        load = as_array(load)
+        if price is not None:
+            tariffs["price"] = price
+        tariffs = {**self.system.application.series(), **{k: as_array(v) for k, v in tariffs.items()}}
+
+        n_windows = (len(load) - self.span) // self.step + 1
+        if n_windows <= 0:
+            raise ValueError(f"The load has {len(load)} values, less than one window of {self.span}")
+
+        model = self.build()
+        self.reset()  # the model still holds the final soc of a previous run
+
+        records = []
+        for k in range(n_windows):
+            start = k * self.step
+            self.update(
+                self.window(load, start),
+                soc_start=soc_start,
+                **{name: self.window(values, start) for name, values in tariffs.items()},
+            )
+            self.solve()
+
+            for t in range(self.step):
+                records.append(self._record(model, start + t, t))
+            soc_start = self.system.storage.state_of_charge(model.storage, self.step - 1)
+
+        return pd.DataFrame.from_records(records, index="step")
+
+    def _record(self, model, step: int, t: int) -> dict:
+        return {
+            "step": step,
+            "load": opt.value(model.demand.power[t]),
+            "grid": opt.value(model.grid[t]),
+            "feedin": opt.value(model.feedin[t]),
+            "power": opt.value(model.storage.power[t]),
+            "soc": self.system.storage.state_of_charge(model.storage, t),
+        }
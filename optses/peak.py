@@ -0,0 +1,179 @@
+import numpy as np
+
+from optses.application.peak_shaving import PeakShaving
+from optses.model import SystemModel, check_linear_system
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.erm import EnergyReservoirModel
+from optses.timeseries import as_array, step_lengths
+
+
+class PeakShavingBisection:
+    """Solver-free `PeakShaving` for one `EnergyReservoirModel` with an ideal or
+    constant efficiency converter.
+
+    The peak is found by bisection on the grid power threshold. A threshold is
+    feasible if the storage can cover all load above it: one forward pass
+    discharges exactly the excess and charges as much as possible below the
+    threshold, which gives the highest reachable soc at every step. The schedule
+    of the minimal threshold charges as late and as little as possible (backward
+    pass of the required soc), so no energy is bought for unused charge.
+
+    The minimal peak is the optimum of the Pyomo model as long as the peak price
+    outweighs the cost of the conversion losses of shaving it, the usual case.
+    Time-varying electricity prices are not supported, the cheapest charging
+    times would need an LP.
+
+    All passes are vectorized over sites: `solve_sites` evaluates many load
+    profiles of the same storage at once.
+    """
+
+    name = "bisection"
+
+    def __init__(self, tol: float = 1e-6, max_iterations: int = 100) -> None:
+        self.tol = tol  # of the peak, relative to the largest load
+        self.max_iterations = max_iterations
+
+    def available(self) -> bool:
+        return True
+
+    @staticmethod
+    def _params(system: SystemModel) -> dict:
+        check_linear_system(system, cells=(EnergyReservoirModel,), applications=(PeakShaving,))
+        cell = system.storage.cell_model
+        converter = system.storage.converter_model
+        application = system.application
+        if application.series():
+            raise ValueError("Time-varying electricity prices are not supported")
+
+        if isinstance(converter, ConstantEfficiencyConverter):
+            ce, cd = converter._effc, converter._effd
+        else:
+            ce = cd = 1.0
+        capacity = cell._capacity
+        return {
+            "ce": ce,
+            "cd": cd,
+            "charge_max": cell._power / ce,  # ac power
+            "discharge_max": cell._power * cd,
+            "gain": ce * cell._effc,  # stored energy per ac charge energy
+            "drain": 1 / (cd * cell._effd),  # stored energy per ac discharge energy
+            "psd": cell._psd,
+            "soc_start": cell._soc_start * capacity,
+            "soc_end": cell._soc_end * capacity,
+            "soc_min": cell._soc_bounds[0] * capacity,
+            "soc_max": cell._soc_bounds[1] * capacity,
+            "capacity": capacity,
+        }
+
+    @staticmethod
+    def _split(load, threshold, p) -> tuple:
+        "AC discharge needed above the threshold and charge room below it"
+        excess = load - threshold[:, None]
+        discharge = np.clip(excess, 0.0, None)
+        room = np.clip(-excess, 0.0, p["charge_max"])
+        return discharge, room
+
+    def feasible(self, load: np.ndarray, threshold: np.ndarray, dt: np.ndarray, p: dict) -> np.ndarray:
+        "Sites whose load can be kept at or below the threshold"
+        discharge, room = self._split(load, threshold, p)
+        eps = 1e-9 * max(p["capacity"], 1.0)
+
+        ok = np.all(discharge <= p["discharge_max"] + eps, axis=1)
+        soc = np.full(len(load), p["soc_start"])
+        for t in range(load.shape[1]):
+            soc = np.minimum(soc + dt[t] * (p["gain"] * room[:, t] - p["drain"] * discharge[:, t] - p["psd"]), p["soc_max"])
+            ok &= soc >= p["soc_min"] - eps
+        return ok & (soc >= p["soc_end"] - eps)
+
+    def schedule(self, load: np.ndarray, threshold: np.ndarray, dt: np.ndarray, p: dict) -> tuple:
+        "AC charge and discharge power and soc of the latest, smallest charging for a feasible threshold"
+        discharge, room = self._split(load, threshold, p)
+        T = load.shape[1]
+
+        # lowest soc after each step from which the rest of the horizon is feasible
+        required = np.empty_like(load)
+        required[:, -1] = max(p["soc_end"], p["soc_min"])
+        for t in range(T - 1, 0, -1):
+            reach = dt[t] * (p["gain"] * room[:, t] - p["drain"] * discharge[:, t] - p["psd"])
+            required[:, t - 1] = np.maximum(required[:, t] - reach, p["soc_min"])
+
+        charge = np.empty_like(load)
+        soc = np.empty_like(load)
+        level = np.full(len(load), p["soc_start"])
+        for t in range(T):
+            level = level - dt[t] * (p["drain"] * discharge[:, t] + p["psd"])
+            charge[:, t] = np.clip((required[:, t] - level) / (dt[t] * p["gain"]), 0.0, room[:, t])
+            level = level + dt[t] * p["gain"] * charge[:, t]
+            soc[:, t] = level
+        return charge, discharge, soc
+
+    def minimal_peak(self, load: np.ndarray, dt: np.ndarray, p: dict, peak_min: float = 0.0) -> np.ndarray:
+        "Lowest feasible grid power threshold per site, nan for infeasible sites"
+        peak = load.max(axis=1)
+        lower = np.maximum(peak - p["discharge_max"], max(peak_min, 0.0))
+        upper = np.maximum(peak + p["charge_max"], lower)  # room to charge at every step
+
+        feasible = self.feasible(load, upper, dt, p)
+        done = self.feasible(load, lower, dt, p)
+        upper = np.where(done, lower, upper)
+
+        tol = self.tol * max(np.abs(load).max(), 1.0)
+        for _ in range(self.max_iterations):
+            if np.all(upper - lower <= tol):
+                break
+            middle = (lower + upper) / 2
+            ok = self.feasible(load, middle, dt, p)
+            upper = np.where(ok, middle, upper)
+            lower = np.where(ok, lower, middle)
+        return np.where(feasible, upper, np.nan)
+
+    def solve_sites(self, system: SystemModel, loads, horizon: int = None) -> dict:
+        """Results of the system for every row of `loads` (sites x time steps), with
+        the extracted results as arrays (sites x time) and `peak` and `objective` per site"""
+        p = self._params(system)
+        loads = np.atleast_2d(np.asarray(loads, dtype=float))
+        if horizon is None:
+            horizon = loads.shape[1]
+        loads = loads[:, :horizon]
+        dt = step_lengths(system.dt, horizon)
+        weight = 1.0 if system.weight is None else system.weight[:horizon]
+        application = system.application
+
+        peak = self.minimal_peak(loads, dt, p, application._peak_power_min)
+        infeasible = np.isnan(peak)
+        charge, discharge, soc = self.schedule(loads, np.where(infeasible, loads.max(axis=1), peak), dt, p)
+
+        power = charge - discharge
+        grid = loads + power
+        result = {
+            "grid": np.clip(grid, 0.0, None),
+            "feedin": np.clip(-grid, 0.0, None),
+            "storage.pc": charge * p["ce"],
+            "storage.pd": discharge / p["cd"],
+            "storage.power_dc": charge * p["ce"] - discharge / p["cd"],
+            "storage.soc": soc,
+        }
+        if isinstance(system.storage.converter_model, ConstantEfficiencyConverter):
+            result["storage.pec"] = charge
+            result["storage.ped"] = discharge
+        result["storage.power"] = power
+        result["grid_connection.power"] = grid
+
+        energy = (result["grid"] * dt * weight).sum(axis=1)
+        result["peak"] = peak
+        result["objective"] = peak * application._peak_power_price + energy * application._electricity_price
+        for name, values in result.items():
+            if values.ndim == 2:
+                values[infeasible] = np.nan
+        return result
+
+    def run(self, system: SystemModel, horizon: int = None, components=None) -> dict:
+        "Results of one system in the structure of `optses.results.extract` plus the objective"
+        result = self.solve_sites(system, as_array(system.load.profile)[None, :], horizon)
+        if np.isnan(result["peak"][0]):
+            raise RuntimeError("Peak shaving problem is infeasible")
+        return {
+            name: values[0] if values.ndim == 2 else np.array(values[0])
+            for name, values in result.items()
+            if components is None or name in components or name.rsplit(".", 1)[-1] in components or name in ("peak", "objective")
+        }
@@ -0,0 +1,60 @@
+import numpy as np
+import pyomo.environ as opt
+
+
+def lower_convex_hull(x, y) -> tuple:
+    "Vertices of the lower convex hull of points sorted by x"
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    hull = []
+    for k in range(len(x)):
+        # drop the last vertex while it lies on or above the line to the new point
+        while len(hull) >= 2:
+            i, j = hull[-2], hull[-1]
+            cross = (x[j] - x[i]) * (y[k] - y[i]) - (y[j] - y[i]) * (x[k] - x[i])
+            if cross > 0:
+                break
+            hull.pop()
+        hull.append(k)
+    return x[hull], y[hull]
+
+
+def convex_envelope(f, lower: float, upper: float, segments: int) -> tuple:
+    """Convex piecewise linear under-estimator of `f` on [lower, upper].
+
+    `f` is sampled at `segments + 1` points and the lower convex hull of the samples
+    is returned as `(slopes, intercepts)` of its linear pieces, so that
+    `max_k(slopes[k] * x + intercepts[k])` approximates `f` from below.
+    """
+    x = np.linspace(lower, upper, segments + 1)
+    y = np.asarray(f(x), dtype=float)
+    hx, hy = lower_convex_hull(x, y)
+
+    slopes = np.diff(hy) / np.diff(hx)
+    intercepts = hy[:-1] - slopes * hx[:-1]
+    return slopes, intercepts
+
+
+def evaluate_envelope(slopes, intercepts, x) -> np.ndarray:
+    "Value of the convex piecewise linear function at `x`"
+    x = np.asarray(x, dtype=float)
+    return np.max(np.multiply.outer(x, slopes) + intercepts, axis=-1)
+
+
+def add_loss_envelope(block, name: str, power, loss, lower: float, upper: float, segments: int):
+    """Add a loss variable bounded below by the convex piecewise linear envelope of
+    the loss curve `loss(p)` sampled on [lower, upper] (outer approximation)."""
+    model = block.model()
+    slopes, intercepts = convex_envelope(loss, lower, upper, segments)
+
+    var = opt.Var(model.time, within=opt.Reals)
+    block.add_component(name, var)
+
+    def envelope(b, t, k):
+        return var[t] >= slopes[k] * power[t] + intercepts[k]
+
+    block.add_component(
+        f"{name}_envelope", opt.Constraint(model.time, range(len(slopes)), rule=envelope)
+    )
+    return var
@@ -0,0 +1,212 @@
+import contextlib
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+import pyomo.environ as opt
+
+
+# the profiler of the enclosing `with BuildProfiler()`, None if profiling is off
+_active = None
+
+# solver methods timed per solve phase (file-based and appsi solvers)
+_SOLVER_PHASES = {
+    "_presolve": "write",
+    "set_instance": "write",
+    "update": "write",
+    "_postsolve": "load",
+}
+
+
+class BuildProfiler:
+    """Opt-in instrumentation of model builds and solves.
+
+    Inside `with BuildProfiler() as profiler:` every `SystemModel.build` records the
+    wall time and (with `memory`) the traced peak memory of each component build,
+    e.g. load, storage with its cell and converter model, grid and application.
+    Every section also counts the components it added (with `components`):
+    variables, constraints, expressions and params, and the nonlinear constraints.
+    Solves of the optses solver wrappers record their write, solve and load times.
+
+    `report()` returns the records as DataFrame, `summary()` as text, and
+    `write_trace(path)` a trace file for chrome://tracing or Perfetto.
+    """
+
+    def __init__(self, memory: bool = True, components: bool = True) -> None:
+        self.memory = memory
+        self.components = components
+        self.records = []
+
+        self._stack = []  # names of the open sections
+        self._peaks = []  # peak memory of the open sections, updated by nested ones
+        self._origin = None
+        self._tracing = False
+
+    def __enter__(self) -> "BuildProfiler":
+        global _active
+        if _active is not None:
+            raise RuntimeError("A BuildProfiler is already active")
+        _active = self
+        self._origin = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global _active
+        _active = None
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    @contextlib.contextmanager
+    def section(self, name: str, block=None, kind: str = "build"):
+        "Record time, memory and (for a block) the added components of the enclosed code"
+        existing = _component_ids(block) if self.components and block is not None else None
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                # resetting the peak here would drop it from the enclosing section
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+
+        self._stack.append(name)
+        self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            path = "/".join(self._stack)
+            self._stack.pop()
+            peak = self._peaks.pop()
+
+            record = {
+                "name": path,
+                "kind": kind,
+                "depth": len(self._stack),
+                "start": start - self._origin,
+                "duration": duration,
+            }
+            if memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                record["memory"] = (peak - current) / 2**20  # MiB
+            if existing is not None:
+                record.update(_component_counts(block, existing))
+            self.records.append(record)
+
+    @contextlib.contextmanager
+    def solve(self, solver, name: str):
+        "Record a solve of the pyomo solver object `solver` split into write, solve and load"
+        phases = dict.fromkeys(("write", "load"), 0.0)
+
+        def timed(method, phase):
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    phases[phase] += time.perf_counter() - start
+
+            return wrapper
+
+        patched = [m for m in _SOLVER_PHASES if hasattr(solver, m)]
+        for method in patched:
+            setattr(solver, method, timed(getattr(solver, method), _SOLVER_PHASES[method]))
+        start = time.perf_counter()
+        try:
+            with self.section(f"solve {name}", kind="solve"):
+                yield
+        finally:
+            total = time.perf_counter() - start
+            for method in patched:
+                delattr(solver, method)  # drop the instance attribute, the class method remains
+
+            record = self.records[-1]
+            record["write"] = phases["write"]
+            record["load"] = phases["load"]
+            record["solve"] = max(total - phases["write"] - phases["load"], 0.0)
+
+    def report(self) -> pd.DataFrame:
+        "Records in the order the sections were opened"
+        if not self.records:
+            return pd.DataFrame()
+        return pd.DataFrame.from_records(self.records).sort_values("start", kind="stable").reset_index(drop=True)
+
+    def summary(self) -> str:
+        report = self.report()
+        if report.empty:
+            return "no records"
+        report["name"] = ["  " * d + n.rsplit("/", 1)[-1] for d, n in zip(report["depth"], report["name"])]
+        for column in ("variables", "constraints", "nonlinear"):
+            if column in report:
+                report[column] = report[column].astype("Int64")
+        columns = [
+            c
+            for c in ("name", "duration", "memory", "variables", "constraints", "nonlinear", "write", "solve", "load")
+            if c in report
+        ]
+        return report[columns].to_string(index=False, float_format=lambda x: f"{x:.4g}", na_rep="")
+
+    def write_trace(self, path) -> None:
+        "Write the records in the Chrome trace event format"
+        events = []
+        for record in self.records:
+            args = {k: v for k, v in record.items() if k not in ("name", "start", "duration") and pd.notna(v)}
+            events.append(
+                {
+                    "name": record["name"].rsplit("/", 1)[-1],
+                    "cat": record["kind"],
+                    "ph": "X",
+                    "ts": record["start"] * 1e6,  # µs
+                    "dur": record["duration"] * 1e6,
+                    "pid": 0,
+                    "tid": 0,
+                    "args": args,
+                }
+            )
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def _component_ids(block) -> set:
+    return {id(c) for c in block.component_objects(descend_into=True)}
+
+
+def _component_counts(block, existing: set) -> dict:
+    "Number of variables, constraints, expressions and params added to the block"
+    counts = dict.fromkeys(("variables", "constraints", "expressions", "params", "nonlinear"), 0)
+    for ctype, key in (
+        (opt.Var, "variables"),
+        (opt.Constraint, "constraints"),
+        (opt.Expression, "expressions"),
+        (opt.Param, "params"),
+    ):
+        for component in block.component_objects(ctype, descend_into=True):
+            if id(component) in existing:
+                continue
+            counts[key] += len(component)
+            if ctype is opt.Constraint:
+                counts["nonlinear"] += sum(
+                    1 for c in component.values() if c.body.polynomial_degree() not in (0, 1)
+                )
+    return counts
+
+
+def profiled(name: str, block=None):
+    "Section of the active profiler, a no-op if profiling is off"
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.section(name, block)
+
+
+def profiled_solve(solver, name: str):
+    "Solve section of the active profiler, a no-op if profiling is off"
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.solve(solver, name)
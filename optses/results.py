@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pyomo.environ as opt
+from pyomo.common.collections import ComponentSet
+from pyomo.core.base.component import Component
+
+
+def time_components(block, ctype=(opt.Var, opt.Expression), components=None) -> dict:
+    """Time-indexed components of a block and its sub-blocks.
+
+    Keys are the names relative to the block (e.g. `storage.soc` for the model).
+    `components` restricts the selection to these names or local names. Components
+    with a `Reference` (e.g. `grid` to `grid_connection.power_buy`) are only
+    selected under the name of the reference, unless they are named explicitly.
+    """
+    model = block.model()
+    objects = list(block.component_objects(ctype, active=True, descend_into=True))
+    referents = ComponentSet(c.referent for c in objects if c.is_reference() and isinstance(c.referent, Component))
+
+    selected = {}
+    for component in objects:
+        if not component.is_indexed() or component.index_set() is not model.time:
+            continue
+        if components is None and component in referents:
+            continue
+
+        name = component.getname(fully_qualified=True, relative_to=block)
+        if components is not None and name not in components and component.local_name not in components:
+            continue
+        selected[name] = component
+    return selected
+
+
+def values(component, dtype=float) -> np.ndarray:
+    "Values of a time-indexed Var, Param or Expression as array"
+    return _values(component, list(component.model().time), dtype)
+
+
+def _values(component, index, dtype) -> np.ndarray:
+    if component.ctype is opt.Var:
+        data = (component[t].value for t in index)
+    else:
+        data = (opt.value(component[t], exception=False) for t in index)
+    return np.fromiter((np.nan if v is None else v for v in data), dtype=dtype, count=len(index))
+
+
+def extract(block, components=None, dtype=float, ctype=(opt.Var, opt.Expression)) -> dict:
+    "Values of all time-indexed Vars and Expressions of the block as arrays"
+    index = list(block.model().time)
+    return {
+        name: _values(component, index, dtype)
+        for name, component in time_components(block, ctype, components).items()
+    }
+
+
+def extract_frame(block, components=None, dtype=float, ctype=(opt.Var, opt.Expression)) -> pd.DataFrame:
+    "Values of all time-indexed Vars and Expressions of the block as DataFrame"
+    index = pd.Index(list(block.model().time), name="time")
+    return pd.DataFrame(extract(block, components, dtype, ctype), index=index)
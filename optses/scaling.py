@@ -0,0 +1,123 @@
+import math
+
+import pyomo.environ as opt
+from pyomo.common.collections import ComponentMap
+from pyomo.core.expr.calculus.derivatives import Modes, differentiate
+from pyomo.repn import generate_standard_repn
+
+# factors are kept within these limits, like ipopt's nlp_scaling_min_value
+_MIN_FACTOR, _MAX_FACTOR = 1e-8, 1e8
+
+
+def _clip(factor: float) -> float:
+    return min(max(factor, _MIN_FACTOR), _MAX_FACTOR)
+
+
+def _active(model, ctype):
+    return model.component_data_objects(ctype, active=True, descend_into=True)
+
+
+def variable_magnitudes(model, passes: int = 10) -> ComponentMap:
+    """Typical absolute value of every variable of the model.
+
+    Bounded variables take the larger absolute bound. The magnitude of an
+    unbounded variable follows from an equality constraint in which it is the
+    only unknown linear term: the sum of the magnitudes of the other terms,
+    evaluated with the params of the model and the known variables at their
+    magnitudes. If no such constraint is left, all unknown linear terms of a
+    constraint take the size of its known terms. Variables that remain unknown
+    after `passes` take their current value, or 1.
+    """
+    magnitudes = ComponentMap()
+    for var in model.component_data_objects(opt.Var, descend_into=True):
+        bounds = [abs(b) for b in var.bounds if b is not None and b != 0]
+        if var.fixed and var.value is not None:
+            bounds = [abs(var.value)]
+        if bounds:
+            magnitudes[var] = max(bounds)
+
+    equalities = [c for c in _active(model, opt.Constraint) if c.equality]
+    single = True
+    for _ in range(passes):
+        found = False
+        for constraint in equalities:
+            repn = generate_standard_repn(constraint.body, compute_values=True, quadratic=False)
+            terms = [(v, abs(c)) for v, c in zip(repn.linear_vars, repn.linear_coefs) if c != 0]
+            unknown = [(v, c) for v, c in terms if v not in magnitudes]
+            nonlinear = list(repn.nonlinear_vars)
+            if not unknown or (single and len(unknown) > 1) or any(v not in magnitudes for v in nonlinear):
+                continue
+            size = abs(repn.constant) + sum(c * magnitudes[v] for v, c in terms if v in magnitudes)
+            if repn.nonlinear_expr is not None:
+                size += abs(_evaluate(repn.nonlinear_expr, nonlinear, magnitudes))
+            if size > 0 and math.isfinite(size):
+                for var, coef in unknown:
+                    magnitudes[var] = size / coef
+                found = True
+        if not found and not single:
+            break
+        # several unknowns of one constraint are each of the size of the known terms
+        single = found
+
+    for var in model.component_data_objects(opt.Var, descend_into=True):
+        if var not in magnitudes:
+            magnitudes[var] = abs(var.value) if var.value else 1.0
+    return magnitudes
+
+
+def _evaluate(expr, variables: list, magnitudes: ComponentMap, gradient: bool = False):
+    "Value (or gradient) of the expression with the variables at their magnitudes"
+    saved = [var.value for var in variables]
+    try:
+        for var in variables:
+            var.set_value(magnitudes[var], skip_validation=True)
+        if gradient:
+            return differentiate(expr, wrt_list=variables, mode=Modes.reverse_numeric)
+        return opt.value(expr, exception=False) or 0.0
+    except (ArithmeticError, ValueError):
+        return [0.0] * len(variables) if gradient else 0.0
+    finally:
+        for var, value in zip(variables, saved):
+            var.set_value(value, skip_validation=True)
+
+
+def _row_scale(expr, magnitudes: ComponentMap) -> float:
+    "Largest absolute gradient entry of the expression in magnitude-scaled variables"
+    repn = generate_standard_repn(expr, compute_values=True, quadratic=False)
+    entries = [abs(c) * magnitudes[v] for v, c in zip(repn.linear_vars, repn.linear_coefs)]
+    if repn.nonlinear_expr is not None:
+        variables = list(repn.nonlinear_vars)
+        gradient = _evaluate(repn.nonlinear_expr, variables, magnitudes, gradient=True)
+        entries += [abs(g) * magnitudes[v] for v, g in zip(variables, gradient)]
+    entries = [e for e in entries if e > 0 and math.isfinite(e)]
+    return max(entries) if entries else 1.0
+
+
+def scaling_factors(model) -> ComponentMap:
+    """Scaling factors of the variables, constraints and objectives of the model.
+
+    A variable is divided by its magnitude (`variable_magnitudes`), so its scaled
+    value is of order one. Constraints and objectives are divided by their
+    largest gradient entry with respect to the scaled variables.
+    """
+    magnitudes = variable_magnitudes(model)
+    factors = ComponentMap((var, _clip(1 / magnitude)) for var, magnitude in magnitudes.items())
+    for constraint in _active(model, opt.Constraint):
+        factors[constraint] = _clip(1 / _row_scale(constraint.body, magnitudes))
+    for objective in _active(model, opt.Objective):
+        factors[objective] = _clip(1 / _row_scale(objective.expr, magnitudes))
+    return factors
+
+
+def add_scaling_suffix(model, factors: ComponentMap = None) -> opt.Suffix:
+    """Attach the scaling factors as `scaling_factor` suffix of the model, which is
+    exported to ipopt (`nlp_scaling_method=user-scaling`) and read by `core.scale_model`"""
+    if factors is None:
+        factors = scaling_factors(model)
+    if model.component("scaling_factor") is None:
+        model.scaling_factor = opt.Suffix(direction=opt.Suffix.EXPORT)
+    suffix = model.scaling_factor
+    suffix.clear()
+    for component, factor in factors.items():
+        suffix[component] = factor
+    return suffix
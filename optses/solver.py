@@ -0,0 +1,186 @@
+import weakref
+
+import pyomo.environ as opt
+
+from optses.profiling import profiled_solve
+from optses.scaling import add_scaling_suffix
+
+# solvers with an in-memory persistent interface (pyomo.contrib.appsi)
+PERSISTENT_SOLVERS = ("highs", "gurobi", "cplex")
+# of those, the ones whose appsi interface accepts quadratic objectives
+QUADRATIC_PERSISTENT_SOLVERS = ("gurobi", "cplex")
+
+_IPOPT_WARM_START = {
+    "warm_start_init_point": "yes",
+    "warm_start_bound_push": 1e-6,
+    "warm_start_mult_bound_push": 1e-6,
+    "mu_init": 1e-6,
+}
+
+
+class PersistentSolver:
+    """Solver instance that stays attached to one model.
+
+    The model is passed to the solver once. Later solves only push the changed
+    mutable params (also where they appear in bounds and objective terms) and
+    variable bounds, and the solver restarts from its previous basis.
+    """
+
+    def __init__(
+        self, solver: str = "highs", options: dict = None, check_structure: bool = False
+    ) -> None:
+        self.name = solver
+        self._solver = opt.SolverFactory(f"appsi_{solver}")
+        if options is not None:
+            self._solver.options.update(options)
+
+        # set check_structure if components are added to or removed from the model between solves
+        config = self._solver.update_config
+        config.check_for_new_or_removed_constraints = check_structure
+        config.check_for_new_or_removed_vars = check_structure
+        config.check_for_new_or_removed_params = check_structure
+        config.check_for_new_objective = check_structure
+        config.update_constraints = check_structure
+        config.update_named_expressions = check_structure
+        config.update_vars = True
+        config.update_params = True
+
+        self.model = None
+
+    def available(self) -> bool:
+        return self._solver.available(exception_flag=False)
+
+    def attach(self, model) -> None:
+        self._solver.set_instance(model)
+        self.model = model
+
+    def solve(self, model, tee: bool = False):
+        with profiled_solve(self._solver, self.name):
+            if model is not self.model:
+                self.attach(model)
+            # appsi raises on models without a feasible solution unless loading is deferred
+            results = self._solver.solve(model, tee=tee, warmstart=True, load_solutions=False)
+
+        if opt.check_optimal_termination(results):
+            self._load(model)
+        return results
+
+    def _load(self, model) -> None:
+        self._solver.load_vars()
+        if hasattr(model, "dual") and model.dual.import_enabled():
+            model.dual.update(self._solver.get_duals())
+        if hasattr(model, "rc") and model.rc.import_enabled():
+            model.rc.update(self._solver.get_reduced_costs())
+
+
+class WarmStartSolver:
+    """File-based solver that starts every solve from the previous solution.
+
+    MIP solvers receive the current variable values as initial solution. For ipopt
+    the primal-dual point (duals and bound multipliers) of the previous solve is
+    exported together with the primal values.
+    """
+
+    def __init__(self, solver: str = "ipopt", options: dict = None) -> None:
+        self.name = solver
+        self._solver = opt.SolverFactory(solver)
+        if options is not None:
+            self._solver.options.update(options)
+
+        self._warm = weakref.WeakSet()  # models holding a previous solution
+
+    def available(self) -> bool:
+        return self._solver.available(exception_flag=False)
+
+    def solve(self, model, tee: bool = False):
+        warm = model in self._warm
+
+        with profiled_solve(self._solver, self.name):
+            if self.name == "ipopt":
+                self._declare_ipopt_suffixes(model)
+                # for this solve only, the options of the solver stay those of a cold start
+                options = _IPOPT_WARM_START if warm else {}
+                results = self._solver.solve(model, tee=tee, load_solutions=False, options=options)
+            elif self._solver.warm_start_capable():
+                results = self._solver.solve(model, tee=tee, load_solutions=False, warmstart=warm)
+            else:
+                results = self._solver.solve(model, tee=tee, load_solutions=False)
+
+        if opt.check_optimal_termination(results):
+            model.solutions.load_from(results)
+            self._warm.add(model)
+            if self.name == "ipopt":
+                # exported multipliers are the imported ones of the last solve
+                model.ipopt_zL_in.update(model.ipopt_zL_out)
+                model.ipopt_zU_in.update(model.ipopt_zU_out)
+        return results
+
+    @staticmethod
+    def _declare_ipopt_suffixes(model) -> None:
+        if hasattr(model, "ipopt_zL_out"):
+            return
+        model.ipopt_zL_out = opt.Suffix(direction=opt.Suffix.IMPORT)
+        model.ipopt_zU_out = opt.Suffix(direction=opt.Suffix.IMPORT)
+        model.ipopt_zL_in = opt.Suffix(direction=opt.Suffix.EXPORT)
+        model.ipopt_zU_in = opt.Suffix(direction=opt.Suffix.EXPORT)
+        if not hasattr(model, "dual"):
+            model.dual = opt.Suffix(direction=opt.Suffix.IMPORT_EXPORT)
+
+
+class ScaledSolver:
+    """Solver for badly scaled models, e.g. `RintModel` with cell and pack quantities.
+
+    Scaling factors of variables, constraints and objective are computed from the
+    params and bounds of the model on its first solve (`optses.scaling`) and
+    attached as `scaling_factor` suffix. ipopt applies them itself
+    (`nlp_scaling_method=user-scaling`) and returns unscaled values. With
+    `transform`, or for other solvers, a scaled copy of the model is solved
+    (`core.scale_model`) and its solution propagated back to the model.
+    """
+
+    def __init__(self, solver: str = "ipopt", options: dict = None, transform: bool = False) -> None:
+        self.name = solver
+        self._solver = opt.SolverFactory(solver)
+        if options is not None:
+            self._solver.options.update(options)
+        self.transform = transform or solver != "ipopt"
+
+        self._scaled = weakref.WeakSet()  # models with scaling factors
+
+    def available(self) -> bool:
+        return self._solver.available(exception_flag=False)
+
+    def solve(self, model, tee: bool = False):
+        if model not in self._scaled:
+            add_scaling_suffix(model)
+            self._scaled.add(model)
+
+        with profiled_solve(self._solver, self.name):
+            if not self.transform:
+                self._solver.options["nlp_scaling_method"] = "user-scaling"
+                results = self._solver.solve(model, tee=tee, load_solutions=False)
+                if opt.check_optimal_termination(results):
+                    model.solutions.load_from(results)
+                return results
+
+            scaling = opt.TransformationFactory("core.scale_model")
+            scaled = scaling.create_using(model)
+            results = self._solver.solve(scaled, tee=tee, load_solutions=False)
+            if opt.check_optimal_termination(results):
+                scaled.solutions.load_from(results)
+                scaling.propagate_solution(scaled, model)
+        return results
+
+
+def solver_factory(solver, options: dict = None, quadratic: bool = False):
+    """Persistent solver if available, else a warm-started file-based solver.
+    With `quadratic` only persistent interfaces that accept quadratic objectives."""
+    if not isinstance(solver, str):
+        return solver
+
+    if solver in (QUADRATIC_PERSISTENT_SOLVERS if quadratic else PERSISTENT_SOLVERS):
+        persistent = PersistentSolver(solver, options=options)
+        if persistent.available():
+            return persistent
+
+    return WarmStartSolver(solver, options=options)
@@ -0,0 +1,235 @@
+import numpy as np
+import pyomo.environ as opt
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
+from optses.application.arbitrage import Arbitrage
+from optses.application.peak_shaving import PeakShaving
+from optses.model import SystemModel, check_linear_system
+from optses.solver import solver_factory
+from optses.timeseries import _fit, as_array, step_lengths
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.erm import EnergyReservoirKineticModel, EnergyReservoirModel
+
+
+class SparseLP:
+    """Linear `SystemModel` emitted directly as sparse constraint matrices.
+
+    Alternative backend to the Pyomo model for the linear components:
+    `EnergyReservoirModel`/`EnergyReservoirKineticModel` cells, `IdealConverter`/
+    `ConstantEfficiencyConverter`, `Grid` and `PeakShaving`/`Arbitrage`. The problem
+    is identical to `SystemModel.build`:
+
+        min  c @ x
+        s.t. A_ub @ x <= b_ub
+             A_eq @ x == b_eq
+             lb <= x <= ub
+    """
+
+    def __init__(self, system: SystemModel, horizon: int = None, build: bool = True) -> None:
+        check_linear_system(
+            system,
+            cells=(EnergyReservoirModel, EnergyReservoirKineticModel),
+            applications=(PeakShaving, Arbitrage),
+        )
+        if isinstance(system.application, Arbitrage) and system.application._price is None:
+            raise ValueError("Arbitrage requires a price")
+
+        if horizon is None:
+            horizon = len(system.load.profile)
+
+        self.system = system
+        self.horizon = horizon
+
+        self.variables = {}  # name -> slice of x
+        if build:
+            self.build()
+
+    def _add_variables(self, name: str, size: int, lb, ub) -> None:
+        start = self._n
+        self._n += size
+        self.variables[name] = slice(start, self._n)
+        self._lb.append(np.broadcast_to(np.asarray(lb, dtype=float), size))
+        self._ub.append(np.broadcast_to(np.asarray(ub, dtype=float), size))
+
+    def _rows(self, blocks: dict, n_rows: int) -> sp.csr_matrix:
+        "Row block of the constraint matrix from per-variable sub-matrices"
+        row = [None] * len(self.variables)
+        for i, (name, index) in enumerate(self.variables.items()):
+            if name in blocks:
+                row[i] = blocks[name]
+            else:
+                row[i] = sp.csr_matrix((n_rows, index.stop - index.start))
+        return sp.hstack(row, format="csr")
+
+    def build(self) -> None:
+        system = self.system
+        cell = system.storage.cell_model
+        converter = system.storage.converter_model
+        application = system.application
+
+        T = self.horizon
+        dt = step_lengths(system.dt, T)
+        load = system.load.profile[:T]
+
+        capacity = cell._capacity
+        power = cell._power
+        soc_min, soc_max = cell._soc_bounds
+        soc_start = cell._soc_start
+        soc_end = cell._soc_end
+        effc, effd, psd = cell._effc, cell._effd, cell._psd
+
+        ## Variables
+        self._n = 0
+        self._lb, self._ub = [], []
+        self.variables = {}
+        self._add_variables("pc", T, 0.0, power)
+        self._add_variables("pd", T, 0.0, power)
+        self._add_variables("soc", T, soc_min * capacity, soc_max * capacity)
+        if isinstance(converter, ConstantEfficiencyConverter):
+            self._add_variables("pec", T, 0.0, np.inf)
+            self._add_variables("ped", T, 0.0, np.inf)
+        self._add_variables("power_buy", T, 0.0, np.inf)
+        self._add_variables("power_sell", T, 0.0, np.inf)
+        if isinstance(application, PeakShaving):
+            self._add_variables("peak", 1, application._peak_power_min, np.inf)
+
+        eye = sp.identity(T, format="csr")
+        zeros = np.zeros(T)
+
+        ## Equality constraints
+        eq_rows, b_eq = [], []
+
+        # soc balance: soc[t] - soc[t-1] - dt * (effc * pc[t] - pd[t] / effd) == -dt * psd
+        rhs = np.full(T, -dt * psd)
+        rhs[0] += soc_start * capacity
+        eq_rows.append(
+            self._rows(
+                {
+                    "soc": sp.diags([np.ones(T), -np.ones(T - 1)], [0, -1], format="csr"),
+                    "pc": sp.diags(-dt * effc, format="csr"),
+                    "pd": sp.diags(dt / effd, format="csr"),
+                },
+                T,
+            )
+        )
+        b_eq.append(rhs)
+
+        # converter efficiency: pc - pd == effc * pec - ped / effd
+        if isinstance(converter, ConstantEfficiencyConverter):
+            eq_rows.append(
+                self._rows(
+                    {
+                        "pc": eye,
+                        "pd": -eye,
+                        "pec": -converter._effc * eye,
+                        "ped": eye / converter._effd,
+                    },
+                    T,
+                )
+            )
+            b_eq.append(zeros)
+            storage_power = {"pec": eye, "ped": -eye}
+        else:
+            storage_power = {"pc": eye, "pd": -eye}
+
+        # power balance: power_buy - power_sell - storage power == load
+        balance = {name: -block for name, block in storage_power.items()}
+        balance.update({"power_buy": eye, "power_sell": -eye})
+        eq_rows.append(self._rows(balance, T))
+        start = sum(len(b) for b in b_eq)
+        self._balance = slice(start, start + T)  # rows of b_eq holding the load
+        b_eq.append(load)
+
+        ## Inequality constraints
+        ub_rows, b_ub = [], []
+
+        # soc end: soc[T-1] >= soc_end * capacity
+        end = sp.csr_matrix(([-1.0], ([0], [T - 1])), shape=(1, T))
+        ub_rows.append(self._rows({"soc": end}, 1))
+        b_ub.append(np.array([-soc_end * capacity]))
+
+        if isinstance(cell, EnergyReservoirKineticModel):
+            rate_c, rate_d = cell._kintetik_params
+            mc = -power / (rate_c * capacity)
+            bc = soc_max * (power / rate_c)
+            md = -power / (rate_d * capacity)
+            bd = soc_min * (power / rate_d)
+            # pc - pd <= mc * soc + bc
+            ub_rows.append(self._rows({"pc": eye, "pd": -eye, "soc": -mc * eye}, T))
+            b_ub.append(np.full(T, bc))
+            # pc - pd >= md * soc + bd
+            ub_rows.append(self._rows({"pc": -eye, "pd": eye, "soc": md * eye}, T))
+            b_ub.append(np.full(T, -bd))
+
+        ## Objective
+        weight = 1.0 if system.weight is None else system.weight[:T]
+        c = np.zeros(self._n)
+        if isinstance(application, PeakShaving):
+            # power_buy <= peak
+            ub_rows.append(
+                self._rows({"power_buy": eye, "peak": -sp.csr_matrix(np.ones((T, 1)))}, T)
+            )
+            b_ub.append(zeros)
+
+            c[self.variables["peak"]] = application._peak_power_price
+        self._energy_cost = dt * weight  # cost per unit price
+        self.c = c
+        self.update(**{name: getattr(application, f"_{name}") for name in application.tariffs})
+
+        self.A_eq = sp.vstack(eq_rows, format="csr")
+        self.b_eq = np.concatenate(b_eq)
+        self.A_ub = sp.vstack(ub_rows, format="csr")
+        self.b_ub = np.concatenate(b_ub)
+        self.bounds = np.column_stack((np.concatenate(self._lb), np.concatenate(self._ub)))
+
+    def update(self, load=None, **tariffs) -> None:
+        "Replace the load and the tariffs of the application without rebuilding"
+        T = self.horizon
+        if load is not None:
+            self.b_eq[self._balance] = as_array(load)[:T]
+
+        application = self.system.application
+        application._check_tariffs(tariffs)
+        tariffs = {name: _fit(range(T), values) for name, values in tariffs.items()}
+        if "electricity_price" in tariffs:
+            self.c[self.variables["power_buy"]] = tariffs["electricity_price"] * self._energy_cost
+        if "price" in tariffs:
+            self.c[self.variables["power_buy"]] = tariffs["price"] * self._energy_cost
+            self.c[self.variables["power_sell"]] = -tariffs["price"] * self._energy_cost
+
+    def solve(self, method: str = "highs", **options):
+        "Solve with scipy's LP interface; the result holds the values per variable"
+        result = linprog(
+            self.c,
+            A_ub=self.A_ub,
+            b_ub=self.b_ub,
+            A_eq=self.A_eq,
+            b_eq=self.b_eq,
+            bounds=self.bounds,
+            method=method,
+            options=options or None,
+        )
+        if result.status != 0:
+            raise RuntimeError(f"LP solve failed: {result.message}")
+
+        result.variables = {name: result.x[index] for name, index in self.variables.items()}
+        return result
+
+
+def compare_objective(system: SystemModel, horizon: int = None, solver="highs") -> dict:
+    "Objective values of the sparse and the Pyomo backend for the same system"
+    lp = SparseLP(system, horizon)
+    sparse_objective = lp.solve().fun
+
+    model = system.build(lp.horizon)
+    results = solver_factory(solver).solve(model)
+    if not opt.check_optimal_termination(results):
+        raise RuntimeError(f"Pyomo solve failed: {results.solver.termination_condition}")
+    pyomo_objective = opt.value(model.objective)
+
+    return {
+        "sparse": sparse_objective,
+        "pyomo": pyomo_objective,
+        "difference": sparse_objective - pyomo_objective,
+    }
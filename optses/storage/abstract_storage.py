@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 
+import pyomo.environ as opt
 from pyomo.core.base.PyomoModel import Model
 
 class AbstractStorageModel(ABC):
@@ -8,3 +9,10 @@ class AbstractStorageModel(ABC):
     def build(self, block) -> None:
         pass
 
+    def state_of_charge(self, block, t) -> float:
+        "SOC as fraction of the capacity after the solve"
+        return opt.value(block.soc[t])
+
+    def derived(self, block) -> dict:
+        "Derived time series of the solved block as arrays"
+        return {}
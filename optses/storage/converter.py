@@ -3,12 +3,19 @@ from abc import ABC, abstractmethod
 import numpy as np
 import pyomo.environ as opt
 
+from optses.piecewise import add_loss_envelope
+from optses.results import values
+
 
 class AbstractConverter(ABC):
     @abstractmethod
     def build(self, block) -> None:
         pass
 
+    def derived(self, block) -> dict:
+        "Time series of the Expressions left out by `lean`, computed from the solution"
+        return {}
+
 class IdealConverter(AbstractConverter):
     def __init__(self, power=None) -> None:
         self._power = power
@@ -38,8 +45,8 @@ class ConstantEfficiencyConverter(AbstractConverter):
 
         # block.pemax = opt.Param(within=opt.NonNegativeReals, initialize=self._power)
 
-        block.pec = opt.Var(model.time)  # bound method?
-        block.ped = opt.Var(model.time)
+        block.pec = opt.Var(model.time, within=opt.NonNegativeReals)  # bound method?
+        block.ped = opt.Var(model.time, within=opt.NonNegativeReals)
 
         @block.Constraint(model.time)
         def converter_efficiency(b, t):
@@ -50,11 +57,23 @@ class ConstantEfficiencyConverter(AbstractConverter):
             return b.pec[t] - b.ped[t]
 
 class QuadraticLossConverter(AbstractConverter):
-    def __init__(self, power, k0, k1, k2) -> None:
+    """Set `segments` to replace the loss curve by a convex piecewise linear approximation (LP).
+    With `lean` the loss Expression is inlined into its constraint."""
+
+    def __init__(self, power, k0, k1, k2, segments: int = None, lean: bool = False) -> None:
         self._power = power
         self._k0 = k0 * power
         self._k1 = k1
         self._k2 = k2 / power
+        self._segments = segments
+        self._lean = lean
+
+    def loss(self, power):
+        "Converter loss at AC power"
+        return (
+            self._k0 * (1 - np.exp(-1000 * power**2))
+            + self._k1 * power + self._k2 * power**2
+        )
 
     def build(self, block) -> None:
         model = block.model()
@@ -66,16 +85,29 @@ class QuadraticLossConverter(AbstractConverter):
         block.pemax = opt.Param(within=opt.NonNegativeReals, initialize=self._power)
         block.power = opt.Var(model.time, bounds=(-block.pemax, block.pemax))
 
-        @block.Expression(model.time)
         def converter_loss(b, t):
             return (
                 b.k0 * (1 - opt.exp(-1000 * b.power[t] ** 2)) # 
                 + b.k1 * b.power[t] + b.k2 * b.power[t] ** 2
             )
 
+        inline = self._lean and not self._segments
+        if self._segments:
+            add_loss_envelope(
+                block, "converter_loss", block.power, self.loss, -self._power, self._power, self._segments
+            )
+        elif not inline:
+            block.converter_loss = opt.Expression(model.time, rule=converter_loss)
+
         @block.Constraint(model.time)
         def converter_loss_constraint(b, t):
-            return b.power_dc[t] == b.power[t] - b.converter_loss[t] # <=
+            loss = converter_loss(b, t) if inline else b.converter_loss[t]
+            return b.power_dc[t] == b.power[t] - loss # <=
+
+    def derived(self, block) -> dict:
+        if self._segments:
+            return {}
+        return {"converter_loss": self.loss(values(block.power))}
 
 
 class NottonLossConverter(AbstractConverter):
@@ -83,11 +115,17 @@ class NottonLossConverter(AbstractConverter):
     # h0: -69.327
     # k0: 0.00696564 
     # k2: 0.0332086
-    def __init__(self, power, m0, k0, k2) -> None:
+    def __init__(self, power, m0, k0, k2, segments: int = None, lean: bool = False) -> None:
         self._power = power
         self._m0 = m0 / power # / power ** 2 for x^2  
         self._k0 = k0 * power
         self._k2 = k2 / power
+        self._segments = segments  # convex piecewise linear loss curve (LP)
+        self._lean = lean  # inline abspower and converter_loss into the constraint
+
+    def loss(self, power):
+        "Converter loss at charge or discharge AC power"
+        return self._k0 * (1 - np.exp(self._m0 * power)) + self._k2 * power**2
 
     def build(self, block) -> None:
         model = block.model()
@@ -105,24 +143,64 @@ class NottonLossConverter(AbstractConverter):
         def power(b, t):
             return b.power_c[t] - b.power_d[t]
 
-        @block.Expression(model.time)
-        def abspower(b, t):
-            return b.power_c[t] + b.power_d[t]
+        if self._segments:
+            # charge and discharge do not coincide in the optimum, the losses are separable
+            add_loss_envelope(block, "loss_c", block.power_c, self.loss, 0, self._power, self._segments)
+            add_loss_envelope(block, "loss_d", block.power_d, self.loss, 0, self._power, self._segments)
 
-        @block.Expression(model.time)
-        def converter_loss(b, t):
-            return b.k0 * (1 - opt.exp(b.m0 * b.abspower[t])) + b.k2 * b.power[t] ** 2
+            def converter_loss(b, t):
+                return b.loss_c[t] + b.loss_d[t]
+        else:
+            def converter_loss(b, t):
+                abspower = b.power_c[t] + b.power_d[t]
+                return b.k0 * (1 - opt.exp(b.m0 * abspower)) + b.k2 * b.power[t] ** 2
+
+        if not self._lean:
+            @block.Expression(model.time)
+            def abspower(b, t):
+                return b.power_c[t] + b.power_d[t]
+
+            block.converter_loss = opt.Expression(model.time, rule=converter_loss)
 
         @block.Constraint(model.time)
         def converter_loss_constraint(b, t):
-            return b.power_dc[t] == b.power[t] - b.converter_loss[t] # <= ?
+            loss = converter_loss(b, t) if self._lean else b.converter_loss[t]
+            return b.power_dc[t] == b.power[t] - loss # <= ?
+
+    def derived(self, block) -> dict:
+        power_c, power_d = values(block.power_c), values(block.power_d)
+        abspower = power_c + power_d
+        if self._segments:
+            converter_loss = values(block.loss_c) + values(block.loss_d)
+        else:
+            converter_loss = (
+                self._k0 * (1 - np.exp(self._m0 * abspower)) + self._k2 * (power_c - power_d) ** 2
+            )
+        return {"abspower": abspower, "converter_loss": converter_loss}
 
 class RampinelliFitConverter(AbstractConverter):
-    def __init__(self, power, k0, k1, k2) -> None:
+    def __init__(self, power, k0, k1, k2, segments: int = None, lean: bool = False) -> None:
         self._power = power
         self._k0 = k0
         self._k1 = k1
         self._k2 = k2
+        self._segments = segments  # convex piecewise linear loss curves (LP)
+        self._lean = lean  # inline the efficiencies into the constraint
+
+    def efficiency(self, power):
+        p = np.asarray(power, dtype=float) / self._power
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return p / (p + self._k0 + self._k1 * p + self._k2 * p**2)
+
+    def loss_charge(self, power):
+        "Loss at AC charge power: pec * (1 - effc)"
+        return power * (1 - np.nan_to_num(self.efficiency(power)))
+
+    def loss_discharge(self, power):
+        "Loss at AC discharge power: ped * (1 / effd - 1), zero without discharge"
+        with np.errstate(divide="ignore", invalid="ignore"):
+            loss = power * (1 / self.efficiency(power) - 1)
+        return np.where(power > 0, loss, 0.0)
 
     def build(self, block):
         model = block.model()
@@ -137,25 +215,49 @@ class RampinelliFitConverter(AbstractConverter):
         block.ped = opt.Var(model.time, within=opt.Reals, bounds=(0, block.pemax))
 
         @block.Expression(model.time)
-        def c_effc(b, t):
-            p = b.pec[t] / b.pemax
-            return p / (p + b.k0 + b.k1*p + b.k2*p ** 2)
+        def power(b, t):
+            return b.pec[t] - b.ped[t]
 
-        @block.Expression(model.time)
-        def c_effd(b, t):
-            p = b.ped[t] / b.pemax
+        if self._segments:
+            add_loss_envelope(block, "loss_c", block.pec, self.loss_charge, 0, self._power, self._segments)
+            add_loss_envelope(block, "loss_d", block.ped, self.loss_discharge, 0, self._power, self._segments)
+
+            @block.Constraint(model.time)
+            def converter_efficiency_constraint(b, t):
+                return b.power_dc[t] == b.pec[t] - b.loss_c[t] - b.ped[t] - b.loss_d[t]
+            return
+
+        def efficiency(b, power):
+            p = power / b.pemax
             return p / (p + b.k0 + b.k1*p + b.k2*p ** 2)
 
+        if not self._lean:
+            @block.Expression(model.time)
+            def c_effc(b, t):
+                return efficiency(b, b.pec[t])
+
+            @block.Expression(model.time)
+            def c_effd(b, t):
+                return efficiency(b, b.ped[t])
+
         @block.Constraint(model.time)
         def converter_efficiency_constraint(b, t):
-            return b.power_dc[t] == b.pec[t] * b.c_effc[t] - b.ped[t] * (1 / b.c_effd[t])
+            if self._lean:
+                effc, effd = efficiency(b, b.pec[t]), efficiency(b, b.ped[t])
+            else:
+                effc, effd = b.c_effc[t], b.c_effd[t]
+            return b.power_dc[t] == b.pec[t] * effc - b.ped[t] * (1 / effd)
 
-        @block.Expression(model.time)
-        def power(b, t):
-            return b.pec[t] - b.ped[t]
+    def derived(self, block) -> dict:
+        if self._segments:
+            return {}
+        return {
+            "c_effc": np.nan_to_num(self.efficiency(values(block.pec))),
+            "c_effd": np.nan_to_num(self.efficiency(values(block.ped))),
+        }
 
 
 class NottonFitConverter(RampinelliFitConverter):
-    def __init__(self, power, k0, k2) -> None:
-        super().__init__(power, k0=k0, k1=0.0, k2=k2)
+    def __init__(self, power, k0, k2, segments: int = None, lean: bool = False) -> None:
+        super().__init__(power, k0=k0, k1=0.0, k2=k2, segments=segments, lean=lean)
 
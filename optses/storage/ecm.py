@@ -2,22 +2,48 @@ import math
 import numpy as np
 import pyomo.environ as opt
 
+from optses.piecewise import add_loss_envelope, convex_envelope
+from optses.results import values
 from optses.storage.abstract_storage import AbstractStorageModel
+from optses.timeseries import horizon_length, step_length
 
 
 class RintModel(AbstractStorageModel):
-    "Internal resistance equivalent circuit model"
+    """Internal resistance equivalent circuit model
+
+    `ocv` is either a constraint rule `(block, t)` relating `ocv` and `soc`, or a table
+    `(soc_points, ocv_points)` that is embedded as piecewise linear function
+    (`ocv_repn`, e.g. "INC", "DCC" or "SOS2"). The points have to cover the soc range
+    [0, 1]. The default "INC" needs no SOS constraints, which HiGHS does not support.
+
+    With `bilinear="mccormick"` the power constraint `cell_power == v * i` is replaced
+    by McCormick envelopes over the voltage and current bounds. With
+    `mccormick_segments > 1` the current range is partitioned and the envelopes
+    are selected by binaries, which tightens the relaxation (MILP). The binaries
+    grow with segments times steps: with 4 segments and 96 steps HiGHS did not
+    finish within 200 s, keep the segments low for long horizons.
+    Together with a tabulated ocv the model is an LP/MILP.
+
+    With `lean` the pack-level and loss Expressions (`i_dc`, `v_dc`, `ocv_dc`,
+    `cell_loss`, `cell_loss_dc`) are not built, `derived(block)` computes them
+    from the solution.
+    """
 
     def __init__(
         self,
         capacity: float,
-        ocv,  # callable
+        ocv,  # callable or (soc_points, ocv_points)
         r0: float,
         circuit: dict,
         i_bounds: tuple[float, float] = None,
         soc_bounds: tuple[float, float] = (0.0, 1.0),
         soc_start: float = 0.5,
         eff: float = 0.99,
+        ocv_repn: str = "INC",
+        bilinear: str = "exact",
+        mccormick_segments: int = 1,
+        v_bounds: tuple[float, float] = None,
+        lean: bool = False,
     ) -> None:
         # circuit
         self._parallel = circuit["p"]
@@ -35,6 +61,23 @@ class RintModel(AbstractStorageModel):
             i_bounds = (capacity, capacity)
         self._i_bounds = i_bounds
 
+        if bilinear not in ("exact", "mccormick"):
+            raise ValueError(f"Unknown bilinear formulation: {bilinear}")
+        self._ocv_repn = ocv_repn
+        self._bilinear = bilinear
+        self._mccormick_segments = mccormick_segments
+
+        if v_bounds is None and bilinear == "mccormick":
+            if callable(ocv):
+                raise ValueError("v_bounds are required for McCormick envelopes with an ocv rule")
+            ocv_points = ocv[1]
+            v_bounds = (
+                min(ocv_points) - r0 * i_bounds[1],
+                max(ocv_points) + r0 * i_bounds[0],
+            )
+        self._v_bounds = v_bounds
+        self._lean = lean
+
     def build(self, block) -> None:
         model = block.model()
 
@@ -85,14 +128,14 @@ class RintModel(AbstractStorageModel):
                 return (
                     b.soc[t]
                     == b.soc_start
-                    + model.dt
+                    + step_length(model, t)
                     * (b.ic[t] * b.effc - b.id[t] * (1 / b.effd))
                     / b.cell_capacity
                 )
             return (
                 b.soc[t]
                 == b.soc[t - 1]
-                + model.dt
+                + step_length(model, t)
                 * (b.ic[t] * b.effc - b.id[t] * (1 / b.effd))
                 / b.cell_capacity
             )
@@ -109,7 +152,7 @@ class RintModel(AbstractStorageModel):
         def soc_bounds_upper(b, t):
             return b.soc[t] <= b.soc_max
 
-        block.ocv_constraint = opt.Constraint(model.time, rule=self._ocv)
+        self.ocv_model(block)
 
         @block.Expression(model.time)
         def i(b, t):
@@ -119,14 +162,29 @@ class RintModel(AbstractStorageModel):
         def voltage_constraint(b, t):
             return b.v[t] == (b.ocv[t] + b.r0 * b.i[t])
 
-        @block.Constraint(model.time)
-        def power_constraint(b, t):
-            return b.cell_power[t] == b.v[t] * b.i[t]
+        if self._bilinear == "exact":
+            @block.Constraint(model.time)
+            def power_constraint(b, t):
+                return b.cell_power[t] == b.v[t] * b.i[t]
+        else:
+            self.mccormick_power_model(block)
 
         @block.Expression(model.time)
         def power_dc(b, t):
             return b.cell_power[t] * b.cell_parallel * b.cell_serial
 
+        if not self._lean:
+            self.output_expressions(block)
+
+        # self.degradation_model(block)
+        # @block.Expression()
+        # def cost(b):
+        #     return b.degradation_cost
+
+    def output_expressions(self, block) -> None:
+        "Pack-level and loss Expressions, not used by the constraints"
+        model = block.model()
+
         @block.Expression(model.time)
         def i_dc(b, t):
             return b.i[t] * b.cell_parallel
@@ -147,20 +205,126 @@ class RintModel(AbstractStorageModel):
         def cell_loss_dc(b, t):
             return b.cell_loss[t] * b.cell_parallel * b.cell_serial
 
-        # self.degradation_model(block)
-        # @block.Expression()
-        # def cost(b):
-        #     return b.degradation_cost
+    def derived(self, block) -> dict:
+        ic, id = values(block.ic), values(block.id)
+        parallel, serial = opt.value(block.cell_parallel), opt.value(block.cell_serial)
+        cell_loss = opt.value(block.r0) * (ic + id) ** 2
+        return {
+            "i_dc": (ic - id) * parallel,
+            "v_dc": values(block.v) * serial,
+            "ocv_dc": values(block.ocv) * serial,
+            "cell_loss": cell_loss,
+            "cell_loss_dc": cell_loss * parallel * serial,
+        }
+
+    def ocv_model(self, block) -> None:
+        model = block.model()
+
+        if callable(self._ocv):
+            block.ocv_constraint = opt.Constraint(model.time, rule=self._ocv)
+            return
+
+        soc_points, ocv_points = self._ocv
+        block.ocv_constraint = opt.Piecewise(
+            model.time,
+            block.ocv,
+            block.soc,
+            pw_pts=[float(x) for x in soc_points],
+            f_rule=[float(y) for y in ocv_points],
+            pw_constr_type="EQ",
+            pw_repn=self._ocv_repn,
+        )
+
+    def mccormick_power_model(self, block) -> None:
+        "McCormick envelopes of cell_power == v * i"
+        model = block.model()
+
+        i_lo, i_hi = -self._i_bounds[1], self._i_bounds[0]
+        v_lo, v_hi = self._v_bounds
+        for t in model.time:
+            block.v[t].setlb(v_lo)
+            block.v[t].setub(v_hi)
+
+        n = self._mccormick_segments
+        if n == 1:
+            @block.Constraint(model.time, range(4))
+            def power_envelope(b, t, k):
+                v, i, w = b.v[t], b.i[t], b.cell_power[t]
+                return (
+                    w >= v_lo * i + v * i_lo - v_lo * i_lo,
+                    w >= v_hi * i + v * i_hi - v_hi * i_hi,
+                    w <= v_hi * i + v * i_lo - v_hi * i_lo,
+                    w <= v_lo * i + v * i_hi - v_lo * i_hi,
+                )[k]
+            return
+
+        # partitioned envelopes: disaggregated current, voltage and power per segment
+        i_points = np.linspace(i_lo, i_hi, n + 1)
+        block.segments = opt.RangeSet(0, n - 1)
+        block.segment = opt.Var(model.time, block.segments, within=opt.Binary)
+        block.i_segment = opt.Var(model.time, block.segments)
+        block.v_segment = opt.Var(model.time, block.segments)
+        block.power_segment = opt.Var(model.time, block.segments)
+
+        @block.Constraint(model.time)
+        def segment_choice(b, t):
+            return sum(b.segment[t, k] for k in b.segments) == 1
+
+        @block.Constraint(model.time)
+        def i_disaggregation(b, t):
+            return b.i[t] == sum(b.i_segment[t, k] for k in b.segments)
+
+        @block.Constraint(model.time)
+        def v_disaggregation(b, t):
+            return b.v[t] == sum(b.v_segment[t, k] for k in b.segments)
+
+        @block.Constraint(model.time)
+        def power_disaggregation(b, t):
+            return b.cell_power[t] == sum(b.power_segment[t, k] for k in b.segments)
+
+        @block.Constraint(model.time, block.segments, range(4))
+        def segment_bounds(b, t, k, j):
+            z, i, v = b.segment[t, k], b.i_segment[t, k], b.v_segment[t, k]
+            return (
+                i >= i_points[k] * z,
+                i <= i_points[k + 1] * z,
+                v >= v_lo * z,
+                v <= v_hi * z,
+            )[j]
+
+        @block.Constraint(model.time, block.segments, range(4))
+        def power_envelope(b, t, k, j):
+            z, i, v = b.segment[t, k], b.i_segment[t, k], b.v_segment[t, k]
+            w = b.power_segment[t, k]
+            il, ih = i_points[k], i_points[k + 1]
+            return (
+                w >= v_lo * i + v * il - v_lo * il * z,
+                w >= v_hi * i + v * ih - v_hi * ih * z,
+                w <= v_hi * i + v * il - v_hi * il * z,
+                w <= v_lo * i + v * ih - v_lo * ih * z,
+            )[j]
+
+    def approximation_error(self, block) -> dict:
+        "Error of the linearized power constraint in the solved model"
+        model = block.model()
+        v = np.array([opt.value(block.v[t]) for t in model.time])
+        i = np.array([opt.value(block.i[t]) for t in model.time])
+        cell_power = np.array([opt.value(block.cell_power[t]) for t in model.time])
+
+        error = cell_power - v * i
+        reference = np.abs(v * i).sum()
+        return {
+            "max_abs_error": float(np.abs(error).max()),  # W per cell
+            "mean_abs_error": float(np.abs(error).mean()),
+            "relative_error": float(np.abs(error).sum() / reference) if reference > 0 else 0.0,
+        }
 
     def degradation_model(self, block) -> None:
         model = block.model()
 
-        # Calendaric degradation (with constant temperature)
-        block.ksoc_ref = opt.Param(initialize=2.857)
-        block.ksoc_const = opt.Param(initialize=0.60225)
-        block.k_T = opt.Param(initialize=1.2571e-5)  # ~ 25°C
-        block.soh = opt.Param(initialize=0.99, mutable=True)
+        self.degradation_params(block)
 
+        # Calendaric degradation (with constant temperature)
         @block.Expression(model.time)
         def k_soc(b, t):
             return b.ksoc_ref * (b.soc[t] - 0.5) ** 3 + b.ksoc_const
@@ -168,8 +332,10 @@ class RintModel(AbstractStorageModel):
         @block.Expression()
         def calendaric_degradation(b):
             return (
-                sum(((b.k_soc[t] * b.k_T) ** 2) / (2 * (1 - b.soh)) for t in model.time)
-                * model.dt
+                sum(
+                    ((b.k_soc[t] * b.k_T) ** 2) / (2 * (1 - b.soh)) * step_length(model, t)
+                    for t in model.time
+                )
                 * 3600
             )
 
@@ -182,8 +348,38 @@ class RintModel(AbstractStorageModel):
         #     return ((b.k_soc * b.k_T) ** 2) / (2 * (1 - b.soh)) * 96 * model.dt
 
         # Cyclic degradation
-        block.soc_min_dod = opt.Var(within=opt.UnitInterval)
-        block.soc_max_dod = opt.Var(within=opt.UnitInterval)
+        @block.Expression()
+        def k_dod(b):
+            "DOD stress factor"
+            return b.kdod_ref * (b.dod - 0.6) ** 3 + b.kdod_const
+
+        @block.Expression()
+        def crate(b):
+            "Average c-rate"
+            T = horizon_length(model)  # horizon length in h
+            return b.fec * 2 / T
+
+        @block.Expression()
+        def k_crate(b):
+            return b.kcrate_ref * b.crate + b.kcrate_const
+
+        @block.Expression()
+        def cyclic_degradation(b):
+            return (
+                ((b.k_dod * b.k_crate) ** 2) * b.fec / (2 * 100 * (1 - b.soh)) / 100
+            )  # p.u. -> % (100)
+
+        self.degradation_cost_model(block)
+
+    def degradation_params(self, block) -> None:
+        "Stress factor params, full equivalent cycles and depth of discharge of the degradation models"
+        model = block.model()
+
+        block.ksoc_ref = opt.Param(initialize=2.857)
+        block.ksoc_const = opt.Param(initialize=0.60225)
+        block.k_T = opt.Param(initialize=1.2571e-5)  # ~ 25°C
+        block.soh = opt.Param(initialize=0.99, mutable=True)
+
         block.kdod_ref = opt.Param(initialize=4.0253)
         block.kdod_const = opt.Param(initialize=1.0923)
         block.kcrate_ref = opt.Param(initialize=0.0630)
@@ -192,11 +388,13 @@ class RintModel(AbstractStorageModel):
         @block.Expression()
         def fec(b):
             return (
-                model.dt
-                * sum(b.ic[t] + b.id[t] for t in model.time)
+                sum((b.ic[t] + b.id[t]) * step_length(model, t) for t in model.time)
                 / (2 * b.cell_capacity)
             )
 
+        block.soc_min_dod = opt.Var(within=opt.UnitInterval)
+        block.soc_max_dod = opt.Var(within=opt.UnitInterval)
+
         @block.Constraint(model.time)
         def soc_min_constraint(b, t):
             return b.soc[t] >= b.soc_min_dod
@@ -209,28 +407,7 @@ class RintModel(AbstractStorageModel):
         def dod(b):
             return b.soc_max_dod - b.soc_min_dod
 
-        @block.Expression()
-        def k_dod(b):
-            "DOD stress factor"
-            return b.kdod_ref * (b.dod - 0.6) ** 3 + b.kdod_const
-
-        @block.Expression()
-        def crate(b):
-            "Average c-rate"
-            T = len(model.time) * model.dt  # horizon length in h
-            return b.fec * 2 / T
-
-        @block.Expression()
-        def k_crate(b):
-            return b.kcrate_ref * b.crate + b.kcrate_const
-
-        @block.Expression()
-        def cyclic_degradation(b):
-            return (
-                ((b.k_dod * b.k_crate) ** 2) * b.fec / (2 * 100 * (1 - b.soh)) / 100
-            )  # p.u. -> % (100)
-
-        ##
+    def degradation_cost_model(self, block) -> None:
         block.storage_cost = opt.Param(initialize=1, mutable=True)  # $/Wh
         # block.storage_cost_factor = opt.Param(initialize=1, mutable=True) #
 
@@ -248,3 +425,165 @@ class RintModel(AbstractStorageModel):
                 * b.initial_capacity
                 / (1 - b.eol)
             )  # * b.storage_cost_factor
+
+    def degradation_surrogate_model(
+        self, block, segments: int = 16, repn: str = None, tangent: bool = False, dod: float = 0.6
+    ) -> None:
+        """Piecewise linear surrogate of `degradation_model` with the same components.
+
+        The calendaric stress is the convex envelope of `k_soc(soc)**2` on the soc
+        bounds (LP, underestimates the concave part between about 0.2 and 0.5 soc)
+        or, with `repn` (e.g. "INC"), its exact `Piecewise` interpolation (MILP).
+        The cyclic stress `k_dod(dod)**2 * k_crate(fec)**2 * fec` is exact at
+        `segments + 1` dod levels, the dod is rounded up to a level by binaries.
+        With `tangent` it is instead linearized at a reference cycle (`dod_ref`,
+        `fec_ref`), an LP for a rough first pass: far from the reference the cyclic
+        stress is underestimated, down to zero, `update_degradation_reference`
+        moves the reference to a solution. `degradation_error` reports the errors.
+        """
+        model = block.model()
+        self.degradation_params(block)
+        soc_min, soc_max = self._soc_bounds
+
+        # Calendaric degradation (with constant temperature)
+        ksoc_ref, ksoc_const = opt.value(block.ksoc_ref), opt.value(block.ksoc_const)
+
+        def soc_stress(soc):
+            return (ksoc_ref * (soc - 0.5) ** 3 + ksoc_const) ** 2
+
+        if repn is None:
+            add_loss_envelope(block, "soc_stress", block.soc, soc_stress, soc_min, soc_max, segments)
+        else:
+            soc_points = np.linspace(0.0, 1.0, segments + 1)
+            block.soc_stress = opt.Var(model.time, within=opt.NonNegativeReals)
+            block.soc_stress_constraint = opt.Piecewise(
+                model.time,
+                block.soc_stress,
+                block.soc,
+                pw_pts=soc_points.tolist(),
+                f_rule=soc_stress(soc_points).tolist(),
+                pw_constr_type="EQ",
+                pw_repn=repn,
+            )
+
+        @block.Expression()
+        def calendaric_degradation(b):
+            return (
+                sum(b.soc_stress[t] * step_length(model, t) for t in model.time)
+                * b.k_T**2 / (2 * (1 - b.soh))
+                * 3600
+            )
+
+        # Cyclic degradation
+        T = opt.value(horizon_length(model))
+        kcrate_ref, kcrate_const = opt.value(block.kcrate_ref), opt.value(block.kcrate_const)
+        kdod_ref, kdod_const = opt.value(block.kdod_ref), opt.value(block.kdod_const)
+
+        def cycle_stress(fec):
+            return (kcrate_ref * fec * 2 / T + kcrate_const) ** 2 * fec
+
+        def k_dod_squared(dod):
+            return (kdod_ref * (dod - 0.6) ** 3 + kdod_const) ** 2
+
+        fec_max = T * sum(self._i_bounds) / (2 * self._capacity)
+        # tangents of the convex cycle stress, exact at the points and below in between
+        points = np.linspace(0.0, fec_max, segments + 1)
+        k_crate = kcrate_ref * points * 2 / T + kcrate_const
+        slopes = k_crate**2 + 2 * k_crate * kcrate_ref * 2 / T * points
+        intercepts = cycle_stress(points) - slopes * points
+        block.cycle_stress = opt.Var(within=opt.NonNegativeReals)
+
+        @block.Constraint(range(len(slopes)))
+        def cycle_stress_envelope(b, k):
+            return b.cycle_stress >= slopes[k] * b.fec + intercepts[k]
+
+        block.cyclic_stress = opt.Var(within=opt.NonNegativeReals)
+        if tangent:
+            block.dod_ref = opt.Param(within=opt.UnitInterval, initialize=dod, mutable=True)
+            block.fec_ref = opt.Param(within=opt.NonNegativeReals, initialize=dod, mutable=True)
+            block.dod_stress = opt.Var(within=opt.NonNegativeReals)
+            dod_slopes, dod_intercepts = convex_envelope(k_dod_squared, 0.0, soc_max - soc_min, segments)
+
+            @block.Constraint(range(len(dod_slopes)))
+            def dod_stress_envelope(b, k):
+                return b.dod_stress >= dod_slopes[k] * b.dod + dod_intercepts[k]
+
+            @block.Expression()
+            def k_dod_ref(b):
+                "DOD stress factor of the reference cycle"
+                return b.kdod_ref * (b.dod_ref - 0.6) ** 3 + b.kdod_const
+
+            @block.Constraint()
+            def cyclic_stress_constraint(b):
+                # tangent of k_dod**2 * cycle_stress at the reference cycle
+                reference = (b.kcrate_ref * b.fec_ref * 2 / T + b.kcrate_const) ** 2 * b.fec_ref
+                return b.cyclic_stress >= (
+                    b.k_dod_ref**2 * b.cycle_stress + reference * (b.dod_stress - b.k_dod_ref**2)
+                )
+        else:
+            levels = np.linspace(0.0, soc_max - soc_min, segments + 1)
+            stress = k_dod_squared(levels)
+            big_m = cycle_stress(fec_max)
+            block.dod_levels = opt.RangeSet(0, segments)
+            block.dod_level = opt.Var(block.dod_levels, within=opt.Binary)
+            block.level_stress = opt.Var(block.dod_levels, within=opt.NonNegativeReals)
+
+            @block.Constraint()
+            def dod_level_choice(b):
+                return sum(b.dod_level[j] for j in b.dod_levels) == 1
+
+            @block.Constraint()
+            def dod_level_constraint(b):
+                return b.dod <= sum(levels[j] * b.dod_level[j] for j in b.dod_levels)
+
+            @block.Constraint(block.dod_levels)
+            def level_stress_constraint(b, j):
+                return b.level_stress[j] >= b.cycle_stress - big_m * (1 - b.dod_level[j])
+
+            @block.Constraint()
+            def cyclic_stress_constraint(b):
+                return b.cyclic_stress >= sum(stress[j] * b.level_stress[j] for j in b.dod_levels)
+
+        @block.Expression()
+        def cyclic_degradation(b):
+            return b.cyclic_stress / (2 * 100 * (1 - b.soh)) / 100  # p.u. -> % (100)
+
+        self.degradation_cost_model(block)
+
+    def update_degradation_reference(self, block) -> None:
+        "Reference cycle of the `tangent` degradation surrogate from the solution"
+        block.dod_ref = min(max(opt.value(block.dod), 0.0), 1.0)
+        block.fec_ref = opt.value(block.fec)
+
+    def degradation_error(self, block) -> dict:
+        "Degradation of the surrogate and of the original `degradation_model` on the solution"
+        model = block.model()
+        soc = values(block.soc)
+        dt = np.array([opt.value(step_length(model, t)) for t in model.time])
+        soh = opt.value(block.soh)
+
+        k_soc = opt.value(block.ksoc_ref) * (soc - 0.5) ** 3 + opt.value(block.ksoc_const)
+        calendaric = ((k_soc * opt.value(block.k_T)) ** 2 / (2 * (1 - soh)) * dt).sum() * 3600
+
+        fec = opt.value(block.fec)
+        dod = soc.max() - soc.min()
+        crate = fec * 2 / dt.sum()
+        k_dod = opt.value(block.kdod_ref) * (dod - 0.6) ** 3 + opt.value(block.kdod_const)
+        k_crate = opt.value(block.kcrate_ref) * crate + opt.value(block.kcrate_const)
+        cyclic = (k_dod * k_crate) ** 2 * fec / (2 * 100 * (1 - soh)) / 100
+
+        surrogate = {
+            "calendaric": opt.value(block.calendaric_degradation),
+            "cyclic": opt.value(block.cyclic_degradation),
+        }
+        surrogate["total"] = surrogate["calendaric"] + surrogate["cyclic"]
+        original = {"calendaric": calendaric, "cyclic": cyclic, "total": calendaric + cyclic}
+
+        report = {"dod": dod, "crate": crate}
+        for name in original:
+            report[f"{name}_original"] = original[name]
+            report[f"{name}_surrogate"] = surrogate[name]
+            report[f"{name}_relative_error"] = (
+                (surrogate[name] - original[name]) / original[name] if original[name] > 0 else 0.0
+            )
+        return report
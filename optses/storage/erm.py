@@ -2,6 +2,7 @@ import pyomo.environ as opt
 import numpy as np
 
 from optses.storage.abstract_storage import AbstractStorageModel
+from optses.timeseries import step_length
 
 
 class EnergyReservoirModel(AbstractStorageModel):
@@ -16,13 +17,17 @@ class EnergyReservoirModel(AbstractStorageModel):
         effc: float = 0.97,
         effd: float = None,
         psd: float = 0.0,
+        soc_end: float = None,
     ) -> None:
         if effd is None:
             effd = effc
+        if soc_end is None:
+            soc_end = soc_start
 
         self._capacity = capacity
         self._power = power
         self._soc_start = soc_start
+        self._soc_end = soc_end  # minimum soc at the end of the horizon
         self._soc_bounds = soc_bounds
         self._effc = effc  # charge efficiency
         self._effd = effd  # discharge efficiency
@@ -85,21 +90,24 @@ class EnergyReservoirModel(AbstractStorageModel):
         block.psd = opt.Param(
             within=opt.NonNegativeReals, initialize=self._psd, mutable=True
         )
+        block.soc_end = opt.Param(
+            within=opt.NonNegativeReals, initialize=self._soc_end, mutable=True
+        )
 
         ## Constraints
         @block.Constraint(model.time)
         def soc_balance_constraint(b, t):
             if t == model.time.first():
-                return b.soc[t] == b.soc_start * b.capacity + model.dt * (
+                return b.soc[t] == b.soc_start * b.capacity + step_length(model, t) * (
                     b.pc[t] * b.effc - b.pd[t] * (1 / b.effd) - b.psd
                 )
-            return b.soc[t] == b.soc[t - 1] + model.dt * (
+            return b.soc[t] == b.soc[t - 1] + step_length(model, t) * (
                 b.pc[t] * b.effc - b.pd[t] * (1 / b.effd) - b.psd
             )
 
         @block.Constraint()
         def soc_end_constraint(b):
-            return b.soc[model.time.last()] >= b.soc_start * b.capacity
+            return b.soc[model.time.last()] >= b.soc_end * b.capacity
 
     def objective_cost(self, block):
         ## Objective cost
@@ -107,6 +115,10 @@ class EnergyReservoirModel(AbstractStorageModel):
         def cost(m):
             return 0.0
 
+    def state_of_charge(self, block, t) -> float:
+        # soc is stored as energy content
+        return opt.value(block.soc[t] / block.capacity)
+
 
 class EnergyReservoirKineticModel(EnergyReservoirModel):
     """EnergyReservoirKineticModel extends the EnergyReservoirModel by differentiating available and bound energy reservoirs"""
@@ -121,6 +133,7 @@ class EnergyReservoirKineticModel(EnergyReservoirModel):
         effc: float = 0.97,
         effd: float = None,
         psd: float = 0.0,
+        soc_end: float = None,
     ) -> None:
         super().__init__(
             capacity=capacity,
@@ -130,6 +143,7 @@ class EnergyReservoirKineticModel(EnergyReservoirModel):
             effc=effc,
             effd=effd,
             psd=psd,
+            soc_end=soc_end,
         )
         self._kintetik_params = kinetic_params
 
@@ -182,14 +196,18 @@ class EnergyReservoirDimensionModel(EnergyReservoirModel):
         effc: float = 0.97,
         effd: float = None,
         psd: float = 0.0,
+        soc_end: float = None,
     ) -> None:
         if effd is None:
             effd = effc
+        if soc_end is None:
+            soc_end = soc_start
         
         self._capacity_cost = capacity_cost
         self._power_cost = power_cost
 
         self._soc_start = soc_start
+        self._soc_end = soc_end
         self._soc_bounds = soc_bounds
         self._effc = effc
         self._effd = effd
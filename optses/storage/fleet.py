@@ -0,0 +1,220 @@
+import numpy as np
+import pyomo.environ as opt
+
+from optses.storage.converter import ConstantEfficiencyConverter, IdealConverter
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+from optses.timeseries import step_length
+
+
+class StorageFleet:
+    """Storage units behind one grid connection, built as one block indexed by unit.
+
+    Every unit is an `EnergyReservoirModel` with an ideal (`converter_effc=None`) or
+    constant efficiency converter. Parameters are scalars or one value per unit.
+    The block holds the unit variables `pc`, `pd`, `soc` (and `pec`, `ped`) indexed
+    by `(unit, time)` and the fleet `power` at the grid connection, so a fleet can
+    replace the `StorageSystem` of a `SystemModel`.
+
+    With `aggregate` units with identical parameters are merged into one unit of
+    their summed capacity, power and self-discharge. The merged problem is exact:
+    an equal split of a merged unit is feasible for each of its units.
+    `unit_results` disaggregates the solution to the original units.
+    """
+
+    _PARAMS = ("capacity", "power", "soc_start", "soc_end", "soc_min", "soc_max", "effc", "effd", "psd", "converter_effc", "converter_effd")
+
+    def __init__(
+        self,
+        capacity,
+        power,
+        soc_start=0.5,
+        soc_bounds: tuple = (0.0, 1.0),
+        effc=0.97,
+        effd=None,
+        psd=0.0,
+        soc_end=None,
+        converter_effc=None,
+        converter_effd=None,
+        aggregate: bool = False,
+    ) -> None:
+        if effd is None:
+            effd = effc
+        if soc_end is None:
+            soc_end = soc_start
+        self._ideal = converter_effc is None
+        if self._ideal:
+            converter_effc = 1.0
+        if converter_effd is None:
+            converter_effd = converter_effc
+
+        values = (capacity, power, soc_start, soc_end, *soc_bounds, effc, effd, psd, converter_effc, converter_effd)
+        n_units = max(np.size(v) for v in values)
+        # one row of parameters per unit
+        self._units = np.column_stack([np.broadcast_to(np.asarray(v, dtype=float), n_units) for v in values])
+        self._aggregate = aggregate
+
+        if aggregate:
+            types, labels = np.unique(self._units, axis=0, return_inverse=True)
+            self._types = types
+            self._labels = labels.reshape(-1)
+        else:
+            self._types = self._units
+            self._labels = np.arange(n_units)
+        self._count = np.bincount(self._labels, minlength=len(self._types)).astype(float)
+
+    @classmethod
+    def from_units(cls, units: list, aggregate: bool = False) -> "StorageFleet":
+        "Fleet of `StorageSystem`s with `EnergyReservoirModel` cells and ideal or constant efficiency converters"
+        cells, converters = [], []
+        for unit in units:
+            cell, converter = unit.cell_model, unit.converter_model
+            if type(cell) is not EnergyReservoirModel:
+                raise TypeError(f"Unsupported storage model: {type(cell).__name__}")
+            if not isinstance(converter, (IdealConverter, ConstantEfficiencyConverter)):
+                raise TypeError(f"Unsupported converter model: {type(converter).__name__}")
+            cells.append(cell)
+            converters.append(converter)
+
+        ideal = [isinstance(c, IdealConverter) for c in converters]
+        if all(ideal):
+            converter_effc = converter_effd = None
+        else:
+            converter_effc = [1.0 if i else c._effc for i, c in zip(ideal, converters)]
+            converter_effd = [1.0 if i else c._effd for i, c in zip(ideal, converters)]
+
+        return cls(
+            capacity=[c._capacity for c in cells],
+            power=[c._power for c in cells],
+            soc_start=[c._soc_start for c in cells],
+            soc_bounds=([c._soc_bounds[0] for c in cells], [c._soc_bounds[1] for c in cells]),
+            effc=[c._effc for c in cells],
+            effd=[c._effd for c in cells],
+            psd=[c._psd for c in cells],
+            soc_end=[c._soc_end for c in cells],
+            converter_effc=converter_effc,
+            converter_effd=converter_effd,
+            aggregate=aggregate,
+        )
+
+    @property
+    def n_units(self) -> int:
+        return len(self._units)
+
+    @property
+    def n_types(self) -> int:
+        "Number of units in the built block, the unit types with `aggregate`"
+        return len(self._types)
+
+    def _param(self, name: str) -> dict:
+        values = self._types[:, self._PARAMS.index(name)]
+        if name in ("capacity", "power", "psd"):
+            values = values * self._count  # extensive parameters add up in a merged unit
+        return dict(enumerate(values.tolist()))
+
+    def build(self, block) -> None:
+        model = block.model()
+
+        ## Params
+        block.units = opt.RangeSet(0, self.n_types - 1)
+        block.count = opt.Param(block.units, initialize=dict(enumerate(self._count.tolist())))
+        block.capacity = opt.Param(block.units, within=opt.NonNegativeReals, initialize=self._param("capacity"), mutable=True)
+        block.max_power = opt.Param(block.units, within=opt.NonNegativeReals, initialize=self._param("power"), mutable=True)
+        block.soc_min = opt.Param(block.units, within=opt.NonNegativeReals, initialize=self._param("soc_min"), mutable=True)
+        block.soc_max = opt.Param(block.units, within=opt.NonNegativeReals, initialize=self._param("soc_max"), mutable=True)
+        block.soc_start = opt.Param(block.units, within=opt.NonNegativeReals, initialize=self._param("soc_start"), mutable=True)
+        block.soc_end = opt.Param(block.units, within=opt.NonNegativeReals, initialize=self._param("soc_end"), mutable=True)
+        block.effc = opt.Param(block.units, within=opt.PercentFraction, initialize=self._param("effc"), mutable=True)
+        block.effd = opt.Param(block.units, within=opt.PercentFraction, initialize=self._param("effd"), mutable=True)
+        block.psd = opt.Param(block.units, within=opt.NonNegativeReals, initialize=self._param("psd"), mutable=True)
+
+        ## Variables
+        block.pc = opt.Var(block.units, model.time, bounds=lambda b, u, t: (0, b.max_power[u]))
+        block.pd = opt.Var(block.units, model.time, bounds=lambda b, u, t: (0, b.max_power[u]))
+        block.soc = opt.Var(
+            block.units,
+            model.time,
+            bounds=lambda b, u, t: (b.soc_min[u] * b.capacity[u], b.soc_max[u] * b.capacity[u]),
+        )
+
+        ## Constraints
+        @block.Constraint(block.units, model.time)
+        def soc_balance_constraint(b, u, t):
+            previous = b.soc_start[u] * b.capacity[u] if t == model.time.first() else b.soc[u, t - 1]
+            return b.soc[u, t] == previous + step_length(model, t) * (
+                b.pc[u, t] * b.effc[u] - b.pd[u, t] * (1 / b.effd[u]) - b.psd[u]
+            )
+
+        @block.Constraint(block.units)
+        def soc_end_constraint(b, u):
+            return b.soc[u, model.time.last()] >= b.soc_end[u] * b.capacity[u]
+
+        ## Converter
+        if self._ideal:
+            @block.Expression(block.units, model.time)
+            def unit_power(b, u, t):
+                return b.pc[u, t] - b.pd[u, t]
+        else:
+            block.c_effc = opt.Param(block.units, within=opt.PercentFraction, initialize=self._param("converter_effc"))
+            block.c_effd = opt.Param(block.units, within=opt.PercentFraction, initialize=self._param("converter_effd"))
+            block.pec = opt.Var(block.units, model.time, within=opt.NonNegativeReals)
+            block.ped = opt.Var(block.units, model.time, within=opt.NonNegativeReals)
+
+            @block.Constraint(block.units, model.time)
+            def converter_efficiency(b, u, t):
+                return b.pc[u, t] - b.pd[u, t] == b.c_effc[u] * b.pec[u, t] - (1 / b.c_effd[u]) * b.ped[u, t]
+
+            @block.Expression(block.units, model.time)
+            def unit_power(b, u, t):
+                return b.pec[u, t] - b.ped[u, t]
+
+        @block.Expression(model.time)
+        def power(b, t):
+            return sum(b.unit_power[u, t] for u in b.units)
+
+        @block.Expression()
+        def cost(b):
+            return 0.0
+
+    def state_of_charge(self, block, t) -> float:
+        "SOC of the fleet as fraction of its total capacity"
+        capacity = sum(opt.value(block.capacity[u]) for u in block.units)
+        return sum(block.soc[u, t].value for u in block.units) / capacity
+
+    def unit_results(self, block) -> dict:
+        """Solution per original unit as arrays of shape (units, time): `pc`, `pd`,
+        `soc` (energy), `soc_fraction` and `power`; merged units are split equally."""
+        model = block.model()
+        time = list(model.time)
+        results = {}
+        for name in ("pc", "pd", "soc", "unit_power"):
+            component = block.component(name)
+            data = np.array([[opt.value(component[u, t]) for t in time] for u in block.units])
+            results[name] = data[self._labels] / self._count[self._labels, None]
+        results["power"] = results.pop("unit_power")
+
+        capacity = np.array([opt.value(block.capacity[u]) for u in block.units]) / self._count
+        results["soc_fraction"] = results["soc"] / capacity[self._labels, None]
+        return results
+
+    def derived(self, block) -> dict:
+        return {}
+
+    def units(self) -> list:
+        "The units of the fleet as `StorageSystem`s"
+        systems = []
+        for row in self._units:
+            p = dict(zip(self._PARAMS, row.tolist()))
+            cell = EnergyReservoirModel(
+                capacity=p["capacity"],
+                power=p["power"],
+                soc_start=p["soc_start"],
+                soc_bounds=(p["soc_min"], p["soc_max"]),
+                effc=p["effc"],
+                effd=p["effd"],
+                psd=p["psd"],
+                soc_end=p["soc_end"],
+            )
+            converter = IdealConverter() if self._ideal else ConstantEfficiencyConverter(p["converter_effc"], p["converter_effd"])
+            systems.append(StorageSystem(cell, converter))
+        return systems
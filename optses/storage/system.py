@@ -1,6 +1,7 @@
 from optses.storage.abstract_storage import AbstractStorageModel
-from optses.converter.converter import AbstractConverter
-from optses.converter.converter import IdealConverter
+from optses.storage.converter import AbstractConverter
+from optses.storage.converter import IdealConverter
+from optses.profiling import profiled
 
 class StorageSystem:
     def __init__(
@@ -14,6 +15,23 @@ class StorageSystem:
         self._cell_model = cell_model
         self._converter_model = converter_model
 
+    @property
+    def cell_model(self) -> AbstractStorageModel:
+        return self._cell_model
+
+    @property
+    def converter_model(self) -> AbstractConverter:
+        return self._converter_model
+
     def build(self, block) -> None:
-        self._cell_model.build(block)
-        self._converter_model.build(block)
+        with profiled(type(self._cell_model).__name__, block):
+            self._cell_model.build(block)
+        with profiled(type(self._converter_model).__name__, block):
+            self._converter_model.build(block)
+
+    def state_of_charge(self, block, t) -> float:
+        return self._cell_model.state_of_charge(block, t)
+
+    def derived(self, block) -> dict:
+        "Derived time series of the cell and converter model, also for lean models"
+        return {**self._cell_model.derived(block), **self._converter_model.derived(block)}
@@ -0,0 +1,108 @@
+import itertools
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pyomo.environ as opt
+
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.timeseries import update_param
+
+
+def scenario_grid(**axes) -> list:
+    """Cartesian product of parameter axes.
+
+    Keys are component names of mutable params in the built model, e.g.
+    `scenario_grid(**{"storage.capacity": [50, 100], "peak_shaving.peak_power_price": [80, 120]})`.
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def set_params(model, scenario: dict) -> None:
+    "Update the mutable params of a built model in place"
+    for name, value in scenario.items():
+        param = model.find_component(name)
+        if param is None:
+            raise KeyError(f"Model has no component {name}")
+        if not isinstance(param, opt.Param) or not param.mutable:
+            raise ValueError(f"{name} is not a mutable param")
+
+        if param.is_indexed():
+            update_param(param, value)
+        else:
+            param.set_value(value)
+
+
+# state of a worker process, built once by the pool initializer
+_worker = {}
+
+
+def _init_worker(system, horizon, solver, summarize) -> None:
+    from optses.cache import ModelTemplate  # optses.cache imports this module
+
+    _worker["template"] = ModelTemplate(system, horizon)
+    _worker["solver"] = solver_factory(solver)
+    _worker["summarize"] = summarize
+
+
+def _solve_scenario(item) -> dict:
+    i, scenario = item
+    summarize = _worker["summarize"]
+
+    # params of the previous scenario of the worker are reset to their built values
+    model = _worker["template"].instance(scenario)
+    results = _worker["solver"].solve(model)
+
+    row = {"scenario": i, **scenario}
+    row["termination"] = str(results.solver.termination_condition)
+    if opt.check_optimal_termination(results):
+        row["objective"] = opt.value(model.objective)
+        if summarize is not None:
+            row.update(summarize(model))
+    else:
+        row["objective"] = np.nan
+    return row
+
+
+class ScenarioRunner:
+    """Solves scenario grids in a pool of worker processes.
+
+    Every worker builds the model once and then only updates the mutable params of
+    each scenario before re-solving, starting from the built values so no param of
+    a previous scenario carries over. Workers are replaced after `maxtasksperchild`
+    scenarios to keep their memory bounded.
+    """
+
+    def __init__(
+        self,
+        system: SystemModel,
+        horizon: int = None,
+        solver="highs",
+        processes: int = None,
+        maxtasksperchild: int = 1000,
+        summarize=None,  # callable(model) -> dict, must be picklable
+    ) -> None:
+        self.system = system
+        self.horizon = horizon
+        self.solver = solver
+        self.processes = processes
+        self.maxtasksperchild = maxtasksperchild
+        self.summarize = summarize
+
+    def imap(self, scenarios, chunksize: int = 1):
+        "Yield the result rows in order of completion"
+        with multiprocessing.Pool(
+            processes=self.processes,
+            initializer=_init_worker,
+            initargs=(self.system, self.horizon, self.solver, self.summarize),
+            maxtasksperchild=self.maxtasksperchild,
+        ) as pool:
+            yield from pool.imap_unordered(
+                _solve_scenario, enumerate(scenarios), chunksize=chunksize
+            )
+
+    def run(self, scenarios, chunksize: int = 1) -> pd.DataFrame:
+        rows = list(self.imap(scenarios, chunksize=chunksize))
+        return pd.DataFrame(rows).set_index("scenario").sort_index()
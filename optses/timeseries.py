@@ -0,0 +1,148 @@
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pyomo.environ as opt
+
+try:
+    from pyomo.core.base.component import ComponentData
+except ImportError:  # pyomo < 6.7.1
+    from pyomo.core.base.component import _ComponentData as ComponentData
+
+
+def as_array(profile, column: str = None, dtype=float) -> np.ndarray:
+    """Time series as 1d array.
+
+    Accepts scalars, arrays, pandas Series or DataFrame columns and paths to `.npy`
+    files (memory-mapped) or `.parquet` files (memory-mapped read of `column`).
+    """
+    if isinstance(profile, (str, os.PathLike)):
+        path = pathlib.Path(profile)
+        if path.suffix == ".npy":
+            profile = np.load(path, mmap_mode="r")
+        elif path.suffix == ".parquet":
+            columns = None if column is None else [column]
+            profile = pd.read_parquet(path, columns=columns, memory_map=True)
+        else:
+            raise ValueError(f"Unsupported profile file format: {path.suffix}")
+
+    if isinstance(profile, pd.DataFrame):
+        if column is None:
+            if profile.shape[1] != 1:
+                raise ValueError("column must be given for profiles with several columns")
+            column = profile.columns[0]
+        profile = profile[column]
+
+    if isinstance(profile, pd.Series):
+        profile = profile.to_numpy()
+
+    values = np.asarray(profile, dtype=dtype)
+    if values.ndim > 1:
+        raise ValueError("Time series must be one-dimensional")
+    return values
+
+
+def _fit(index, values) -> np.ndarray:
+    values = as_array(values)
+    n = len(index)
+    if values.ndim == 0:
+        return np.full(n, values)
+    if len(values) < n:
+        raise ValueError(f"Time series has {len(values)} values, {n} are needed")
+    return values[:n]
+
+
+def param_values(index, values) -> dict:
+    "Mapping of the (time) index to the values"
+    return dict(zip(index, _fit(index, values).tolist()))
+
+
+def _check_domain(name: str, domain, values: np.ndarray) -> None:
+    # domains are intervals, checking the extreme values covers all of them
+    if len(values) > 0:
+        extremes = (float(values.min()), float(values.max()))
+        if not all(value in domain for value in extremes):
+            raise ValueError(f"Values of {name} are not in {domain}")
+
+
+def update_param(param, values) -> None:
+    "Set all values of a mutable indexed param in place"
+    index = param.index_set()
+    values = _fit(index, values)
+    _check_domain(param.name, param.domain, values)
+    param.store_values(dict(zip(index, values.tolist())), check=False)
+
+
+# `store_values` creates param data without their index. Pyomo versions that keep
+# the index in a `_index` slot of the data read names and labels from it, older
+# versions search the parent component and need no fix.
+_INDEX_SLOT = "_index" in getattr(ComponentData, "__slots__", ())
+
+
+def _fill(param, mapping: dict) -> None:
+    "Store the values of a newly created param and set the index of its data"
+    param.store_values(mapping, check=False)
+    if not _INDEX_SLOT:
+        return
+    for index, data in param.items():
+        data._index = index
+
+
+def add_time_series(block, name: str, values, within=opt.Reals):
+    "Add a mutable param indexed by the model time to the block and fill it in one pass"
+    model = block.model()
+    param = opt.Param(model.time, within=within, mutable=True)
+    block.add_component(name, param)
+    values = _fit(model.time, values)
+    _check_domain(param.name, within, values)
+    _fill(param, dict(zip(model.time, values.tolist())))
+    return param
+
+
+def step_lengths(dt, horizon: int, broadcast: bool = True):
+    """Lengths of the first `horizon` time steps in h. A scalar `dt` becomes an
+    array of length `horizon`, or stays scalar if not `broadcast`."""
+    if np.ndim(dt) == 0:
+        return np.full(horizon, float(dt)) if broadcast else dt
+    return as_array(dt)[:horizon]
+
+
+def step_length(model, t):
+    "Length of time step t in h, `model.dt` is either scalar or indexed by time"
+    if model.dt.is_indexed():
+        return model.dt[t]
+    return model.dt
+
+
+def horizon_length(model):
+    "Length of the horizon in h"
+    if model.dt.is_indexed():
+        return sum(model.dt[t] for t in model.time)
+    return len(model.time) * model.dt
+
+
+def time_grid(*segments) -> np.ndarray:
+    """Step lengths of a non-uniform time grid from `(n_steps, dt)` segments,
+    e.g. `time_grid((60, 1 / 60), (23, 1.0))` for 1 h at 1 min followed by 23 h at 1 h."""
+    return np.concatenate([np.full(n, dt, dtype=float) for n, dt in segments])
+
+
+def resample(values, dt, base_dt: float) -> np.ndarray:
+    "Mean values of a profile with uniform resolution `base_dt` over the steps `dt`"
+    values = as_array(values)
+    counts = np.rint(as_array(dt) / base_dt).astype(int)
+    if np.any(counts < 1) or not np.allclose(counts * base_dt, dt):
+        raise ValueError("Step lengths must be multiples of the base resolution")
+    if counts.sum() > len(values):
+        raise ValueError(f"Time series has {len(values)} values, {counts.sum()} are needed")
+
+    edges = np.concatenate(([0], np.cumsum(counts)))
+    return np.add.reduceat(values[: edges[-1]], edges[:-1]) / counts
+
+
+def time_weight(model, t):
+    "Weight of a time step in cost terms, e.g. the number of periods a representative period stands for"
+    if hasattr(model, "weight"):
+        return model.weight[t]
+    return 1
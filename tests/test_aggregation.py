@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from optses.aggregation import RepresentativePeriods
+from optses.application.peak_shaving import PeakShaving
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.storage.erm import EnergyReservoirKineticModel, EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+rng = np.random.default_rng(0)
+hour = np.arange(24 * 28) % 24
+LOAD = 50 + 30 * np.sin(np.pi * hour / 24) ** 4 + 10 * rng.uniform(0, 1, len(hour))
+
+
+def system(cell) -> SystemModel:
+    return SystemModel(StorageSystem(cell), PeakShaving(10, 0.2), Load(LOAD), dt=1.0)
+
+
+def test_aggregated_objective_is_close_to_full():
+    results = RepresentativePeriods(24, 7).compare(system(EnergyReservoirModel(100, 50)))
+    assert abs(results["objective_error"]) < 0.01
+
+
+def test_kinetic_model_is_rejected():
+    cell = EnergyReservoirKineticModel(100, 50, (0.5, 1.0))
+    with pytest.raises(TypeError):
+        RepresentativePeriods(24, 7).build(system(cell))
+
+
+@pytest.mark.parametrize("n_periods, keep_peak", [(0, False), (1, True)])
+def test_n_periods_must_exceed_the_peak_period(n_periods, keep_peak):
+    with pytest.raises(ValueError):
+        RepresentativePeriods(24, n_periods, keep_peak=keep_peak)
+
+
+def test_n_periods_must_not_exceed_the_profile():
+    with pytest.raises(ValueError):
+        RepresentativePeriods(24, 29).fit(system(EnergyReservoirModel(100, 50)))
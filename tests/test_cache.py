@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import optses.cache
+from optses.application.arbitrage import Arbitrage
+from optses.cache import ModelTemplate, ResultCache, fingerprint
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+rng = np.random.default_rng(0)
+LOAD = 50 + 20 * rng.uniform(0, 1, 24)
+PRICE = 0.1 + 0.2 * rng.uniform(0, 1, 24)
+
+
+def system(capacity: float = 100) -> SystemModel:
+    return SystemModel(StorageSystem(EnergyReservoirModel(capacity, 50)), Arbitrage(PRICE), Load(LOAD))
+
+
+def test_memory_and_disk_hits(tmp_path):
+    cache = ResultCache(tmp_path)
+    first = cache.solve(system())
+    assert cache.stats["misses"] == 1
+
+    assert cache.solve(system())["objective"] == first["objective"]
+    assert cache.stats["memory_hits"] == 1
+
+    # a new cache on the same directory reads the disk tier
+    other = ResultCache(tmp_path)
+    result = other.solve(system())
+    assert other.stats["disk_hits"] == 1 and other.stats["misses"] == 0
+    np.testing.assert_array_equal(result["storage.soc"], first["storage.soc"])
+
+    cache.solve(system(capacity=200))
+    assert cache.stats["misses"] == 2
+
+
+def test_key_depends_on_solver_options():
+    assert ResultCache.key(system()) != ResultCache.key(system(), options={"presolve": "off"})
+    assert ResultCache.key(system()) == ResultCache.key(system())
+
+
+def test_fingerprint_of_closures():
+    def scaled(factor):
+        return lambda x: factor * x
+
+    assert fingerprint(scaled(1)) != fingerprint(scaled(2))
+    assert fingerprint(scaled(1)) == fingerprint(scaled(1))
+
+
+def test_entries_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(optses.cache.time, "time", lambda: now[0])
+    cache = ResultCache(tmp_path, max_age=60)
+    cache.solve(system())
+
+    now[0] += 30
+    cache.solve(system())
+    assert cache.stats["memory_hits"] == 1
+
+    # the creation time, not the last read, counts
+    now[0] += 31
+    cache.solve(system())
+    assert cache.stats["misses"] == 2
+    assert cache.stats["disk_hits"] == 0
+
+
+def test_template_instances_start_from_the_built_params():
+    template = ModelTemplate(system())
+    model = template.instance({"storage.capacity": 10.0}, price=np.ones(24))
+    assert model.storage.capacity.value == 10.0
+    model = template.instance()
+    assert model.storage.capacity.value == 100
+    assert model.arbitrage.price[0].value == pytest.approx(PRICE[0])
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from optses.application.arbitrage import Arbitrage
+from optses.application.peak_shaving import PeakShaving
+from optses.coupling import Load
+from optses.decomposition import TemporalDecomposition
+from optses.model import SystemModel
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+T = 96
+rng = np.random.default_rng(0)
+PRICE = 0.2 + 0.1 * np.sin(np.linspace(0, 8 * np.pi, T)) + rng.uniform(0, 0.05, T)
+
+
+def system(application=None) -> SystemModel:
+    storage = StorageSystem(EnergyReservoirModel(5000, 2000), ConstantEfficiencyConverter(0.95))
+    return SystemModel(storage, application or Arbitrage(PRICE), Load(np.full(T, 1000.0)), dt=0.25)
+
+
+@pytest.fixture(scope="module")
+def fixed():
+    return TemporalDecomposition(system(), 24, processes=2).run()
+
+
+def test_fixed_boundaries_bound_the_monolithic_objective(fixed):
+    assert fixed["gap"] >= -1e-9
+    soc = fixed["schedule"]["soc"].to_numpy()
+    np.testing.assert_allclose(soc[23:-1:24], fixed["boundaries"][1:-1], atol=1e-9)
+
+
+def test_iterations_close_the_gap(fixed):
+    result = TemporalDecomposition(system(), 24, processes=2, iterations=10).run()
+    assert result["objective"] <= fixed["objective"]
+    assert -1e-9 <= result["gap"] < fixed["gap"]
+    soc = result["schedule"]["soc"].to_numpy()
+    np.testing.assert_allclose(soc[23:-1:24], result["boundaries"][1:-1], atol=1e-9)
+
+
+def test_peak_shaving_is_rejected():
+    with pytest.raises(TypeError):
+        TemporalDecomposition(system(PeakShaving(10, 0.2)), 24)
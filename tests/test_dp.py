@@ -0,0 +1,56 @@
+import numpy as np
+import pyomo.environ as opt
+import pytest
+
+from optses.application.arbitrage import Arbitrage
+from optses.coupling import Load
+from optses.dp import ArbitrageDP
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+T = 96
+rng = np.random.default_rng(0)
+LOAD = rng.uniform(0, 50, T)
+PRICES = rng.uniform(0.1, 0.4, (4, T))
+
+
+def system(price=PRICES[0], **cell):
+    cell = {"soc_end": 0.5, **cell}
+    storage = StorageSystem(EnergyReservoirModel(100, 50, **cell), ConstantEfficiencyConverter(0.95))
+    return SystemModel(storage, Arbitrage(price), Load(LOAD))
+
+
+@pytest.mark.parametrize("cell", [{}, {"psd": 0.5, "soc_start": 0.33}], ids=["default", "self_discharge"])
+def test_gap_to_lp(cell):
+    pytest.importorskip("scipy")
+    gap = ArbitrageDP().compare(system(**cell), PRICES)["gap"]
+    assert np.all(gap >= -1e-9)  # the dp schedule is feasible for the lp
+    assert np.all(gap <= 2e-3)
+
+
+def test_run_matches_pyomo():
+    result = ArbitrageDP().run(system())
+    model = system().build()
+    assert opt.check_optimal_termination(solver_factory("highs").solve(model))
+    optimum = opt.value(model.objective)
+    assert result["objective"] >= optimum - 1e-6 * abs(optimum)
+    assert result["objective"] == pytest.approx(optimum, rel=2e-3)
+
+
+def test_schedule_is_consistent():
+    result = ArbitrageDP().solve_prices(system(), PRICES)
+    soc = result["storage.soc"]
+    assert soc.shape == PRICES.shape
+    assert np.all((soc >= -1e-9) & (soc <= 100 + 1e-9))
+    assert np.all(soc[:, -1] >= 50 - 1e-9)
+    assert np.all(np.abs(result["storage.power"]) <= 50 / 0.95 + 1e-9)
+    objective = (PRICES * result["grid_connection.power"] * 0.25).sum(axis=1)
+    assert np.allclose(result["objective"], objective)
+
+
+def test_levels_validation():
+    with pytest.raises(ValueError):
+        ArbitrageDP(levels=1)
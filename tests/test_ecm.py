@@ -0,0 +1,49 @@
+import numpy as np
+import pyomo.environ as opt
+
+from optses.application.arbitrage import Arbitrage
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.ecm import RintModel
+from optses.storage.system import StorageSystem
+
+def degradation_case(T: int = 48, **surrogate):
+    price = 0.2 + 0.1 * np.sin(np.linspace(0, 4 * np.pi, T)) + np.random.default_rng(1).uniform(0, 0.05, T)
+    cell = RintModel(
+        2.5,
+        lambda b, t: b.ocv[t] == 3.2 + 0.9 * b.soc[t],
+        0.0011,
+        {"p": 100, "s": 14},
+        i_bounds=(2.5, 2.5),
+        bilinear="mccormick",
+        v_bounds=(3.0, 4.3),
+    )
+    system = SystemModel(
+        StorageSystem(cell, ConstantEfficiencyConverter(0.95)), Arbitrage(price), Load(np.zeros(T)), dt=0.25
+    )
+    model = system.build()
+    cell.degradation_surrogate_model(model.storage, **surrogate)
+    model.storage.storage_cost = 1e6  # degradation limits the dod
+    model.objective.deactivate()
+    model.total_cost = opt.Objective(expr=model.objective.expr + model.storage.degradation_cost)
+    assert opt.check_optimal_termination(solver_factory("highs").solve(model))
+    return cell.degradation_error(model.storage)
+
+
+def test_surrogate_cyclic_degradation_is_close():
+    error = degradation_case()
+    assert 0 < error["dod"] < 1
+    assert abs(error["cyclic_relative_error"]) < 0.1
+
+
+def test_exact_calendaric_interpolation():
+    error = degradation_case(T=16, repn="INC", segments=8)
+    assert abs(error["calendaric_relative_error"]) < 0.01
+    assert abs(error["total_relative_error"]) < 0.1
+
+
+def test_tangent_surrogate_is_a_lower_estimate():
+    error = degradation_case(tangent=True)
+    assert error["cyclic_surrogate"] <= error["cyclic_original"]
@@ -0,0 +1,53 @@
+import numpy as np
+import pyomo.environ as opt
+import pytest
+
+from optses.application.arbitrage import Arbitrage
+from optses.application.peak_shaving import PeakShaving
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.fleet import StorageFleet
+from optses.storage.system import StorageSystem
+
+T = 48
+rng = np.random.default_rng(0)
+LOAD = rng.uniform(0, 500, T)
+PRICE = rng.uniform(0.1, 0.4, T)
+TYPES = [(100, 50, 0.95), (200, 60, 0.9), (50, 50, 0.97)]
+UNITS = [
+    StorageSystem(EnergyReservoirModel(capacity, power, effc=effc), ConstantEfficiencyConverter(0.96))
+    for capacity, power, effc in TYPES
+    for _ in range(3)
+]
+
+
+def solve(storage, application):
+    model = SystemModel(storage, application, Load(LOAD)).build()
+    assert opt.check_optimal_termination(solver_factory("highs").solve(model))
+    return model
+
+
+@pytest.mark.parametrize("application", [PeakShaving(100, PRICE), Arbitrage(PRICE)], ids=["peak_shaving", "arbitrage"])
+def test_aggregation_is_exact(application):
+    objectives = {}
+    for aggregate in (False, True):
+        fleet = StorageFleet.from_units(UNITS, aggregate=aggregate)
+        model = solve(fleet, application)
+        objectives[aggregate] = opt.value(model.objective)
+
+        units = fleet.unit_results(model.storage)
+        assert units["power"].shape == (len(UNITS), T)
+        fleet_power = [opt.value(model.storage.power[t]) for t in model.time]
+        np.testing.assert_allclose(units["power"].sum(axis=0), fleet_power, atol=1e-6)
+    assert StorageFleet.from_units(UNITS, aggregate=True).n_types == len(TYPES)
+    assert objectives[True] == pytest.approx(objectives[False], rel=1e-7)
+
+
+def test_single_unit_equals_storage_system():
+    fleet = StorageFleet(100, 50, effc=0.95, converter_effc=0.96)
+    unit = StorageSystem(EnergyReservoirModel(100, 50, effc=0.95), ConstantEfficiencyConverter(0.96))
+    fleet_objective = opt.value(solve(fleet, Arbitrage(PRICE)).objective)
+    assert fleet_objective == pytest.approx(opt.value(solve(unit, Arbitrage(PRICE)).objective), rel=1e-7)
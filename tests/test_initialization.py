@@ -0,0 +1,52 @@
+import numpy as np
+import pyomo.environ as opt
+import pytest
+
+from optses.application.peak_shaving import PeakShaving
+from optses.coupling import Load
+from optses.initialization import SurrogateInitializer
+from optses.model import SystemModel
+from optses.storage.converter import QuadraticLossConverter, RampinelliFitConverter
+from optses.storage.ecm import RintModel
+from optses.storage.system import StorageSystem
+
+ipopt = opt.SolverFactory("ipopt").available(exception_flag=False)
+
+
+def system(converter) -> SystemModel:
+    load = 50 * (1.5 + np.random.default_rng(0).uniform(0, 1, 24))
+    cell = RintModel(250, ([0, 1], [3.2, 4.1]), 0.0011, {"p": 1, "s": 4}, i_bounds=(4, 4))
+    return SystemModel(StorageSystem(cell, converter), PeakShaving(10, 0.0003), Load(load), dt=0.5)
+
+
+@pytest.mark.parametrize(
+    "converter",
+    [
+        QuadraticLossConverter(50, 0.001, 0.01, 0.02),
+        QuadraticLossConverter(50, 0.001, 0.01, 0.02, segments=8),
+        RampinelliFitConverter(50, 0.0094, 0.043, 0.04),
+    ],
+)
+def test_initial_point_is_feasible(converter):
+    system_model = system(converter)
+    model = system_model.build()
+    SurrogateInitializer().initialize(model, system_model)
+
+    for var in model.component_data_objects(opt.Var):
+        lb, ub = var.bounds
+        assert lb is None or var.value >= lb - 1e-9, var.name
+        assert ub is None or var.value <= ub + 1e-9, var.name
+    for constraint in model.component_data_objects(opt.Constraint, active=True):
+        body = opt.value(constraint.body)
+        if constraint.lower is not None:
+            assert body >= opt.value(constraint.lower) - 1e-6, constraint.name
+        if constraint.upper is not None:
+            assert body <= opt.value(constraint.upper) + 1e-6, constraint.name
+
+
+@pytest.mark.skipif(not ipopt, reason="ipopt is not available")
+def test_initialization_saves_iterations():
+    report = SurrogateInitializer().compare(system(QuadraticLossConverter(50, 0.001, 0.01, 0.02)))
+    assert report["initialized_termination"] == "optimal"
+    assert report["initialized_objective"] == pytest.approx(report["cold_objective"], rel=1e-4)
+    assert report["iteration_savings"] > 0
@@ -0,0 +1,43 @@
+import numpy as np
+import pyomo.environ as opt
+
+from optses.application.arbitrage import Arbitrage
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.mpc import RollingHorizon
+from optses.solver import solver_factory
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+rng = np.random.default_rng(0)
+LOAD = 50 + 20 * rng.uniform(0, 1, 48)
+PRICE = 0.1 + 0.2 * rng.uniform(0, 1, 48)
+HORIZON, STEP = 16, 4
+
+
+def system(load, price, soc_start=0.5) -> SystemModel:
+    cell = EnergyReservoirModel(100, 50, soc_start=soc_start, psd=0.1)
+    return SystemModel(StorageSystem(cell), Arbitrage(price), Load(load))
+
+
+def fresh_builds() -> np.ndarray:
+    "Committed soc of every window solved on a newly built model"
+    soc, soc_start = [], 0.5
+    for start in range(0, len(LOAD) - HORIZON + 1, STEP):
+        window = slice(start, start + HORIZON)
+        window_system = system(LOAD[window], PRICE[window], soc_start)
+        model = window_system.build()
+        assert opt.check_optimal_termination(solver_factory("highs").solve(model))
+        soc += [window_system.storage.state_of_charge(model.storage, t) for t in range(STEP)]
+        soc_start = soc[-1]
+    return np.array(soc)
+
+
+def test_rolling_horizon_matches_fresh_builds():
+    mpc = RollingHorizon(system(LOAD, PRICE), HORIZON, STEP)
+    first = mpc.run(LOAD)
+    second = mpc.run(LOAD)  # the reused model is reset between runs
+
+    expected = fresh_builds()
+    np.testing.assert_allclose(first["soc"].to_numpy(), expected, atol=1e-6)
+    np.testing.assert_allclose(second["soc"].to_numpy(), expected, atol=1e-6)
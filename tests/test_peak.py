@@ -0,0 +1,61 @@
+import numpy as np
+import pyomo.environ as opt
+import pytest
+
+from optses.application.peak_shaving import PeakShaving
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.peak import PeakShavingBisection
+from optses.solver import solver_factory
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+T = 96
+rng = np.random.default_rng(0)
+LOADS = rng.uniform(0, 100, (3, T))
+
+
+def system(load, **cell):
+    storage = StorageSystem(EnergyReservoirModel(50, 20, **cell), ConstantEfficiencyConverter(0.95))
+    return SystemModel(storage, PeakShaving(100, 0.2), Load(load))
+
+
+def pyomo_solve(load, **cell):
+    model = system(load, **cell).build()
+    assert opt.check_optimal_termination(solver_factory("highs").solve(model))
+    return opt.value(model.peak_shaving.peak), opt.value(model.objective)
+
+
+@pytest.mark.parametrize("cell", [{}, {"psd": 0.01, "soc_start": 0.2, "soc_end": 0.5}], ids=["default", "self_discharge"])
+def test_run_matches_pyomo(cell):
+    result = PeakShavingBisection().run(system(LOADS[0], **cell))
+    peak, objective = pyomo_solve(LOADS[0], **cell)
+    assert result["peak"] == pytest.approx(peak, rel=1e-5)
+    assert result["objective"] == pytest.approx(objective, rel=1e-5)
+    assert np.all(result["grid"] <= result["peak"] + 1e-6)
+
+
+def test_solve_sites_matches_single_sites():
+    result = PeakShavingBisection().solve_sites(system(LOADS[0]), LOADS)
+    for i, load in enumerate(LOADS):
+        peak, objective = pyomo_solve(load)
+        assert result["peak"][i] == pytest.approx(peak, rel=1e-5)
+        assert result["objective"][i] == pytest.approx(objective, rel=1e-5)
+
+
+def test_infeasible_is_nan():
+    # one hour is too short to charge the empty storage to full
+    infeasible = system(LOADS[0], soc_start=0.0, soc_end=1.0)
+    result = PeakShavingBisection().solve_sites(infeasible, LOADS, horizon=4)
+    assert np.all(np.isnan(result["peak"]))
+    assert np.all(np.isnan(result["storage.soc"]))
+    with pytest.raises(RuntimeError):
+        PeakShavingBisection().run(infeasible, horizon=4)
+
+
+def test_time_varying_price_is_rejected():
+    model = system(LOADS[0])
+    model.application = PeakShaving(100, rng.uniform(0.1, 0.3, T))
+    with pytest.raises(ValueError):
+        PeakShavingBisection().run(model)
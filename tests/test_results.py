@@ -0,0 +1,23 @@
+import numpy as np
+
+from optses.application.peak_shaving import PeakShaving
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.results import extract
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+
+def model():
+    system = SystemModel(StorageSystem(EnergyReservoirModel(100, 50)), PeakShaving(10), Load(np.ones(4)))
+    return system.build()
+
+
+def test_referenced_components_appear_once():
+    names = set(extract(model()))
+    assert {"grid", "feedin", "storage.soc"} <= names
+    assert not names & {"grid_connection.power_buy", "grid_connection.power_sell"}
+
+
+def test_referenced_components_named_explicitly():
+    assert set(extract(model(), components=["grid", "power_buy"])) == {"grid", "grid_connection.power_buy"}
@@ -0,0 +1,61 @@
+import numpy as np
+import pyomo.environ as opt
+import pytest
+
+from optses.application.arbitrage import Arbitrage
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.scaling import scaling_factors, variable_magnitudes
+from optses.solver import ScaledSolver, solver_factory
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.ecm import RintModel
+from optses.storage.system import StorageSystem
+
+T = 48
+
+
+def rint_system() -> opt.ConcreteModel:
+    "Cell currents and voltages next to pack powers in W"
+    price = 0.2 + 0.1 * np.sin(np.linspace(0, 4 * np.pi, T))
+    cell = RintModel(
+        2.5,
+        lambda b, t: b.ocv[t] == 3.2 + 0.9 * b.soc[t],
+        0.0011,
+        {"p": 1000, "s": 100},
+        i_bounds=(2.5, 2.5),
+        bilinear="mccormick",
+        v_bounds=(3.0, 4.3),
+    )
+    storage = StorageSystem(cell, ConstantEfficiencyConverter(0.95))
+    return SystemModel(storage, Arbitrage(price * 1e-3), Load(np.full(T, 1e5)), dt=0.25).build()
+
+
+def test_scaled_solve_matches_unscaled():
+    reference = rint_system()
+    assert opt.check_optimal_termination(solver_factory("highs").solve(reference))
+
+    model = rint_system()
+    assert opt.check_optimal_termination(ScaledSolver("highs").solve(model))
+    assert opt.value(model.objective) == pytest.approx(opt.value(reference.objective), rel=1e-6)
+    # the objective is evaluated with the solution propagated from the scaled copy
+    factors = list(model.scaling_factor.values())
+    assert max(factors) / min(factors) > 1e3
+
+def test_magnitudes_and_factors():
+    model = opt.ConcreteModel()
+    model.x = opt.Var(bounds=(-500, 200))
+    model.y = opt.Var()
+    model.z = opt.Var()
+    model.balance = opt.Constraint(expr=model.y == 4 * model.x + 3)
+    model.ratio = opt.Constraint(expr=2 * model.z == model.y)
+    model.objective = opt.Objective(expr=1e-3 * model.x)
+
+    magnitudes = variable_magnitudes(model)
+    assert magnitudes[model.x] == 500
+    assert magnitudes[model.y] == 2003
+    assert magnitudes[model.z] == pytest.approx(1001.5)
+
+    factors = scaling_factors(model)
+    assert factors[model.x] == pytest.approx(1 / 500)
+    assert factors[model.balance] == pytest.approx(1 / 2003)
+    assert factors[model.objective] == pytest.approx(1 / 0.5)
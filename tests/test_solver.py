@@ -0,0 +1,36 @@
+import pyomo.environ as opt
+import pytest
+
+from optses.solver import PersistentSolver, ScaledSolver, WarmStartSolver
+
+SOLVERS = {
+    "persistent": lambda: PersistentSolver("highs"),
+    "warm_start": lambda: WarmStartSolver("highs"),
+    "scaled": lambda: ScaledSolver("highs"),
+}
+
+
+def model(lower: float) -> opt.ConcreteModel:
+    model = opt.ConcreteModel()
+    model.x = opt.Var(bounds=(0, 10))
+    model.lower = opt.Constraint(expr=model.x >= lower)
+    model.objective = opt.Objective(expr=model.x)
+    model.dual = opt.Suffix(direction=opt.Suffix.IMPORT)
+    return model
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+def test_infeasible_model_returns_results(solver):
+    results = SOLVERS[solver]().solve(model(20))
+    assert not opt.check_optimal_termination(results)
+    assert results.solver.termination_condition == opt.TerminationCondition.infeasible
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+def test_optimal_solution_is_loaded(solver):
+    m = model(2)
+    results = SOLVERS[solver]().solve(m)
+    assert opt.check_optimal_termination(results)
+    assert m.x.value == pytest.approx(2)
+    if solver != "scaled":
+        assert m.dual[m.lower] == pytest.approx(1)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from optses.application.arbitrage import Arbitrage
+from optses.application.peak_shaving import PeakShaving
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.sparse import compare_objective
+from optses.storage.converter import ConstantEfficiencyConverter
+from optses.storage.erm import EnergyReservoirKineticModel, EnergyReservoirModel
+from optses.storage.system import StorageSystem
+
+rng = np.random.default_rng(0)
+LOAD = 50 * (1.5 + rng.uniform(0, 1, 48))
+PRICE = 0.1 + 0.2 * rng.uniform(0, 1, 48)
+
+CELLS = {
+    "erm": lambda: EnergyReservoirModel(100, 50, psd=0.1),
+    "kinetic": lambda: EnergyReservoirKineticModel(100, 50, (0.5, 1.0), psd=0.1),
+}
+APPLICATIONS = {
+    "peak_shaving": lambda: PeakShaving(10, 0.2),
+    "arbitrage": lambda: Arbitrage(PRICE),
+}
+
+
+@pytest.mark.parametrize("cell", CELLS)
+@pytest.mark.parametrize("application", APPLICATIONS)
+def test_sparse_matches_pyomo(cell, application):
+    storage = StorageSystem(CELLS[cell](), ConstantEfficiencyConverter(0.95))
+    system = SystemModel(storage, APPLICATIONS[application](), Load(LOAD), dt=0.5)
+
+    result = compare_objective(system)
+
+    assert result["difference"] == pytest.approx(0, abs=1e-6 * max(abs(result["pyomo"]), 1.0))
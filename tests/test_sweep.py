@@ -0,0 +1,44 @@
+import numpy as np
+import pyomo.environ as opt
+import pytest
+
+from optses.application.peak_shaving import PeakShaving
+from optses.coupling import Load
+from optses.model import SystemModel
+from optses.solver import solver_factory
+from optses.storage.erm import EnergyReservoirModel
+from optses.storage.system import StorageSystem
+from optses.sweep import ScenarioRunner, scenario_grid, set_params
+
+LOAD = 50 + 30 * np.random.default_rng(0).uniform(0, 1, 48)
+
+
+def system() -> SystemModel:
+    return SystemModel(StorageSystem(EnergyReservoirModel(100, 50)), PeakShaving(10, 0.2), Load(LOAD))
+
+
+def sequential(scenario: dict) -> float:
+    model = system().build()
+    set_params(model, scenario)
+    assert opt.check_optimal_termination(solver_factory("highs").solve(model))
+    return opt.value(model.objective)
+
+
+def test_scenario_grid():
+    grid = scenario_grid(a=[1, 2], b=[3])
+    assert grid == [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+
+
+def test_runner_matches_sequential_solves():
+    # one worker solves all scenarios, params set by one must not carry over
+    scenarios = [
+        {"storage.capacity": 5.0},
+        {"peak_shaving.peak_power_price": 50.0},
+        {},
+        *scenario_grid(**{"storage.capacity": [10.0, 150.0], "storage.max_power": [10.0]}),
+    ]
+    results = ScenarioRunner(system(), processes=1).run(scenarios)
+
+    assert (results["termination"] == "optimal").all()
+    expected = [sequential(scenario) for scenario in scenarios]
+    assert results["objective"].tolist() == pytest.approx(expected, rel=1e-9)
@@ -0,0 +1,33 @@
+import numpy as np
+import pyomo.environ as opt
+import pytest
+
+from optses.timeseries import add_time_series, update_param
+
+
+@pytest.fixture
+def model():
+    model = opt.ConcreteModel()
+    model.time = opt.RangeSet(0, 3)
+    model.app = opt.Block()
+    return model
+
+
+def test_add_time_series_names(model):
+    param = add_time_series(model.app, "price", np.arange(4.0))
+    assert [param[t].index() for t in model.time] == list(model.time)
+    assert param[2].name == "app.price[2]"
+    assert str(2 * param[3]) == "2*app.price[3]"
+    assert [opt.value(param[t]) for t in model.time] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_add_time_series_domain(model):
+    with pytest.raises(ValueError):
+        add_time_series(model.app, "price", [1.0, -1.0, 2.0, 3.0], within=opt.NonNegativeReals)
+
+
+def test_update_param(model):
+    param = add_time_series(model.app, "price", 1.0)
+    update_param(param, [4.0, 3.0, 2.0, 1.0])
+    assert param[0].name == "app.price[0]"
+    assert [opt.value(param[t]) for t in model.time] == [4.0, 3.0, 2.0, 1.0]